@@ -0,0 +1,108 @@
+import os
+import sys
+import numpy as np
+from multiprocessing import Pool
+from profilebitfields import *
+from tracecache import program_trace_file, load_trace, count_executed_instructions
+
+# Profiles a whole suite of programs (e.g. embench) in one run
+# Every program's trace is decoded and counted in a process pool (going through the trace caches
+# like the single program profilers); the per program instruction counts are then merged into
+# one suite wide table. From it come the suite wide field histograms and a "global" dictionary
+# per layout, written to profiling/field<n>_<R|I>_global.mem, which is compared against each
+# program's own dictionary (the one profilebitfields.py writes for it, see layout_dictionaries)
+# by the fraction of the program's executed instructions each makes compressible.
+#
+# usage: python3 batchprofile.py [# processes] <program> [<program> ...]
+
+LAYOUTS = [
+    ("R", NAIVE_R_TYPE, NAIVE_R_TYPE_TITLES, NAIVE_R_TYPE_KEY_WIDTHS),
+    ("I", NAIVE_I_TYPE, NAIVE_I_TYPE_TITLES, NAIVE_I_TYPE_KEY_WIDTHS),
+]
+
+# Counts the executed instructions of one program
+# Returns (program, words, counts, # executed instructions, max PC), or (program, None, ...) when
+# it has no trace
+def count_program(program_name):
+    trace_file = program_trace_file(program_name)
+    if not os.path.exists(trace_file):
+        return program_name, None, None, 0, 0
+    instructions, num_instructions, max_pc = count_executed_instructions(load_trace(trace_file))
+    words, counts = to_words(instructions)
+    return program_name, words, counts, num_instructions, max_pc
+
+# Counts every program on a pool of [processes]; programs without a trace are left out
+# Returns {program: (words, counts, # executed instructions, max PC)} in the order given
+def count_programs(programs, processes=None):
+    results = {}
+    with Pool(processes) as pool:
+        for program_name, words, counts, num_instructions, max_pc in pool.imap(count_program, programs):
+            if words is None:
+                print("No trace for " + program_name + ", skipping")
+                continue
+            results[program_name] = (words, counts, num_instructions, max_pc)
+    return results
+
+# Merges the counts of every program into one {binary string: count} table sorted by count
+def merge_counts(results):
+    if not results:
+        return {}
+    words = np.concatenate([result[0] for result in results.values()])
+    counts = np.concatenate([result[1] for result in results.values()])
+    unique, inverse = np.unique(words, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=counts, minlength=len(unique)).astype(np.int64)
+    order = np.argsort(-totals, kind="stable")
+    return dict(zip(to_bitstrings(unique[order], 32), totals[order].tolist()))
+
+# Fraction of a program's executed instructions compressible with each of [candidates]
+# (dictionaries of [layout], see dictionary_hits)
+def dictionary_coverage(words, counts, layout, candidates):
+    hits, compressible = dictionary_hits([extract_field(words, ranges) for ranges in layout], candidates)
+    total = counts.sum()
+    return [float(counts[mask].sum() / total) if total else 0.0 for mask in compressible]
+
+def profile_suite(programs, processes=None):
+    results = count_programs(programs, processes)
+    merged = merge_counts(results)
+    print("############################################")
+    print("Suite: " + " ".join(results.keys()))
+    print("# programs: ", len(results))
+    print("# executed instructions: ", sum(result[2] for result in results.values()))
+    print("# unique instructions: ", len(merged))
+    print("############################################")
+    if not merged:
+        return results, merged
+
+    suite = FieldProfile(merged)
+    print_instr_ratio(suite)
+    for name, layout, titles, key_widths in LAYOUTS:
+        profile_layout(suite, layout, titles, key_widths)
+
+    for name, layout, titles, key_widths in LAYOUTS:
+        global_dictionaries = profile_dictionaries(suite, layout, key_widths)
+        write_dictionaries(global_dictionaries, layout, name + "_global")
+
+        print("############################################")
+        print(name + " layout, key widths " + "/".join(str(width) for width in key_widths))
+        print("program              own dict   global dict")
+        own_total = global_total = 0.0
+        for program_name, (words, counts, num_instructions, max_pc) in results.items():
+            # what make %.bitf writes for the program: its profile sorted by count, like
+            # parse_assembly_file returns it
+            order = np.argsort(-counts, kind="stable")
+            own_dictionaries = layout_dictionaries(FieldProfile.from_words(words[order], counts[order]), layout, key_widths)
+            own, shared = dictionary_coverage(words, counts, layout, [own_dictionaries, global_dictionaries])
+            own_total += own
+            global_total += shared
+            print("%-20s %.4f     %.4f" % (program_name, own, shared))
+        print("%-20s %.4f     %.4f" % ("mean", own_total / len(results), global_total / len(results)))
+        print("############################################")
+    return results, merged
+
+def main():
+    args = sys.argv[1:]
+    processes = int(args.pop(0)) if args and args[0].isdigit() else None
+    profile_suite(args, processes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import re
+import hashlib
+import numpy as np
+import npzcache
+from npzcache import save_npz, read_npz
+
+# Persistent index of a disassembly (programs/<prog>.dump_abi), stored next to it as
+# <dump_abi>.idx.npz so the regex pass over the dump only runs once per binary.
+# Columns, one row per instruction:
+#   pc, opcode      uint32
+#   desc            the instruction text as showtrace.py prints it (tabs turned into spaces)
+#   mnemonic        first word of desc
+#   operands        rest of desc
+#   symbol          index into symbol_name of the function the instruction belongs to (-1: none)
+# plus symbol_pc / symbol_name for every "<symbol>:" label.
+# The index is rebuilt when the dump's size/mtime change and its content hash changed too.
+
+INDEX_VERSION = 1
+
+INSN_RE = re.compile(r'^\s*([0-9a-f]+):\s+([0-9a-f]+)\s*(.*)')
+SYMBOL_RE = re.compile(r'^([0-9a-f]+) <(.*)>:')
+
+def index_path(dump_filename):
+    return dump_filename + ".idx.npz"
+
+def file_hash(filename):
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return np.frombuffer(digest.digest(), dtype=np.uint8)
+
+# Runs the regex pass and returns the index columns
+def build_dump_index(dump_filename):
+    pcs = []
+    opcodes = []
+    descs = []
+    symbols = []
+    symbol_pcs = []
+    symbol_names = []
+    with open(dump_filename, "r") as f:
+        for line in f:
+            match = INSN_RE.match(line)
+            if match:
+                pcs.append(int(match.group(1), 16))
+                opcodes.append(int(match.group(2), 16))
+                descs.append(match.group(3).replace("\t", " "))
+                symbols.append(len(symbol_names) - 1)
+                continue
+            match = SYMBOL_RE.match(line)
+            if match:
+                symbol_pcs.append(int(match.group(1), 16))
+                symbol_names.append(match.group(2))
+
+    split = [desc.split(" ", 1) for desc in descs]
+    return {
+        "pc": np.array(pcs, dtype=np.uint32),
+        "opcode": np.array(opcodes, dtype=np.uint32),
+        "desc": np.array(descs, dtype=str),
+        "mnemonic": np.array([parts[0] for parts in split], dtype=str),
+        "operands": np.array([parts[1] if len(parts) > 1 else "" for parts in split], dtype=str),
+        "symbol": np.array(symbols, dtype=np.int32),
+        "symbol_pc": np.array(symbol_pcs, dtype=np.uint32),
+        "symbol_name": np.array(symbol_names, dtype=str),
+    }
+
+# Loads the index of a disassembly, building (and storing) it when it's missing or out of date
+def load_dump_index(dump_filename):
+    key = npzcache.source_key(INDEX_VERSION, dump_filename)
+    path = index_path(dump_filename)
+    index = read_npz(path, mmap=False)
+    if index is not None:
+        cached_key = index.pop("source_key", None)
+        cached_hash = index.pop("source_hash", None)
+        if cached_key is not None and np.array_equal(cached_key, key):
+            return index
+        # touched but not changed (e.g. re-made from the same elf): keep it, refresh the key
+        if cached_key is not None and cached_key[0] == INDEX_VERSION and cached_hash is not None:
+            content_hash = file_hash(dump_filename)
+            if np.array_equal(cached_hash, content_hash):
+                store_dump_index(path, key, content_hash, index)
+                return index
+
+    index = build_dump_index(dump_filename)
+    store_dump_index(path, key, file_hash(dump_filename), index)
+    return index
+
+def store_dump_index(path, key, content_hash, index):
+    try:
+        save_npz(path, key, dict(index, source_hash=content_hash))
+    except OSError as e:
+        print("Could not write disassembly index " + path + ": " + str(e))
+
+# Returns {pc: (opcode, description)}, the table showtrace.py and the trace decoder walk
+def load_insns(dump_filename):
+    index = load_dump_index(dump_filename)
+    return dict(zip(index["pc"].tolist(), zip(index["opcode"].tolist(), index["desc"].tolist())))
+
+# Returns the name of the function each of [pcs] falls in ("" outside of any symbol)
+def pc_symbols(index, pcs):
+    names = np.append(index["symbol_name"], "")
+    slot = np.searchsorted(index["symbol_pc"], pcs, side="right") - 1
+    return names[np.where(slot >= 0, slot, len(names) - 1)]
@@ -0,0 +1,187 @@
+import sys
+import itertools
+import numpy as np
+from profilebitfields import *
+
+# Explores ways of splitting the 32 instruction bits into N dictionary fields
+# A layout is a tuple of fields, each a tuple of (end, start) bit ranges (see instrfields.py);
+# together the fields cover every bit of the instruction exactly once. Each field gets a key
+# width, and the key widths add up to the compressed instruction size (16 bits in controller.v).
+# An instruction is fully compressible when the value of each of its fields is among the
+# 2^key_width most executed values of that field. The hard-wired layouts at their current key
+# widths are instead scored with the dictionaries profilebitfields.py writes (the first values to
+# appear, see layout_dictionaries), the ones simv_cont runs with.
+# Everything is answered from the per-field rankings of a FieldProfile, so a candidate costs a
+# couple of array operations over the (deduplicated) key widths its instructions need.
+
+COMPRESSED_WIDTH = 16
+# Largest dictionary considered per field (2^8 entries, the largest controller.v uses)
+MAX_KEY_WIDTH = 8
+# Largest joint coverage table built (cells, 8 MB of float64); layouts with more fields than fit
+# are scored split by split instead
+MAX_TABLE_CELLS = 1 << 20
+# (key width split, distinct row) pairs compared at once when scoring splits directly
+MAX_COMPARE_CELLS = 1 << 24
+
+# Every split of the instruction into [num_fields] contiguous fields, field 1 holding the low bits
+def contiguous_layouts(num_fields, min_width=1, word_width=32):
+    for cuts in itertools.combinations(range(min_width, word_width - min_width + 1), num_fields - 1):
+        bounds = (0,) + cuts + (word_width,)
+        if all(bounds[i + 1] - bounds[i] >= min_width for i in range(num_fields)):
+            yield tuple(((bounds[i + 1] - 1, bounds[i]),) for i in range(num_fields))
+
+def is_partition(layout, word_width=32):
+    bits = [bit for ranges in layout for end, start in ranges for bit in range(start, end + 1)]
+    return sorted(bits) == list(range(word_width))
+
+def layout_name(layout):
+    return " | ".join("".join("[%d:%d]" % (end, start) for end, start in ranges) for ranges in layout)
+
+# Every way of giving each field a key width, all adding up to [compressed_width]
+# (a field never gets more key bits than it has value bits, or than [max_key_width])
+def key_width_splits(layout, compressed_width=COMPRESSED_WIDTH, max_key_width=MAX_KEY_WIDTH):
+    limits = [min(field_width(ranges), compressed_width, max_key_width) for ranges in layout]
+    splits = []
+    for widths in itertools.product(*(range(limit + 1) for limit in limits[:-1])):
+        last = compressed_width - sum(widths)
+        if 0 <= last <= limits[-1]:
+            splits.append(widths + (last,))
+    return np.array(splits, dtype=np.int64).reshape(-1, len(layout))
+
+# Key widths every instruction needs for each field of [layout], deduplicated:
+# (distinct rows of needed widths, dynamic count of each)
+def layout_key_bits(profile, layout):
+    needed = np.stack([profile.key_bits(ranges) for ranges in layout], axis=1)
+    rows, inverse = np.unique(needed, axis=0, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), weights=profile.counts, minlength=len(rows))
+    return rows, weights
+
+# Fraction of dynamic instructions fully compressible under each row of [key_widths]
+def coverage(profile, layout, key_widths):
+    key_widths = np.atleast_2d(np.asarray(key_widths, dtype=np.int64))
+    rows, weights = layout_key_bits(profile, layout)
+    covered = np.zeros(len(key_widths))
+    step = max(MAX_COMPARE_CELLS // max(len(rows), 1), 1)
+    for start in range(0, len(key_widths), step):
+        compressible = (rows[None, :, :] <= key_widths[start:start + step, None, :]).all(axis=2)
+        covered[start:start + step] = compressible @ weights
+    return covered / profile.total_count()
+
+# Fraction of dynamic instructions fully compressible with the dictionaries profile_layout writes
+# for [key_widths] (see layout_dictionaries), i.e. what the hardware loads for the layout
+def written_coverage(profile, layout, key_widths):
+    hits, compressible = dictionary_hits([extract_field(profile.words, ranges) for ranges in layout],
+                                         [layout_dictionaries(profile, layout, key_widths)])
+    return float(compressible[0] @ profile.counts / max(profile.total_count(), 1))
+
+# Bits of dictionary storage a layout needs: 2^key_width values of each field
+def dictionary_bits(layout, key_widths):
+    return sum(2**width * field_width(ranges) for ranges, width in zip(layout, key_widths))
+
+# Sorted cumulative coverage of a field: curve[n - 1] is the fraction of dynamic instructions
+# whose value of the field is among its n most executed values
+def field_coverage_curve(profile, ranges):
+    values, rank = profile.ranking(ranges)
+    per_value = np.bincount(rank, weights=profile.counts, minlength=len(values))
+    return np.cumsum(per_value) / profile.total_count()
+
+# Fraction of dynamic instructions a field alone lets through with a [key_width] bit dictionary
+def field_coverage(curve, key_width):
+    if len(curve) == 0:
+        return 0.0
+    return float(curve[min(2**key_width, len(curve)) - 1])
+
+# Joint coverage of every key width combination of a layout as an N-d table:
+# table[k1, k2, ...] is the fraction of dynamic instructions fully compressible with key widths
+# k1, k2, ... It's the histogram of the key widths instructions need (clipped to
+# [max_key_width] + 1, "doesn't fit") summed cumulatively along every axis, so each
+# combination is a single lookup
+def joint_coverage_table(profile, layout, max_key_width=MAX_KEY_WIDTH):
+    rows, weights = layout_key_bits(profile, layout)
+    rows = np.minimum(rows, max_key_width + 1)
+    table = np.zeros((max_key_width + 2,) * len(layout))
+    np.add.at(table, tuple(rows.T), weights)
+    for axis in range(len(layout)):
+        table = np.cumsum(table, axis=axis)
+    return table / max(profile.total_count(), 1)
+
+# Joint coverage of each row of [splits] (key widths of every field of [layout])
+# Looked up in the joint coverage table while it stays under MAX_TABLE_CELLS, otherwise (many
+# fields) every split is checked against the key widths instructions need
+def split_coverage(profile, layout, splits, max_key_width=MAX_KEY_WIDTH):
+    if len(splits) == 0:
+        return np.zeros(0)
+    if (max_key_width + 2)**len(layout) <= MAX_TABLE_CELLS:
+        return joint_coverage_table(profile, layout, max_key_width)[tuple(splits.T)]
+    return coverage(profile, layout, splits)
+
+# Evaluates every key width split of a layout for each of [compressed_widths]
+# Returns [(compressed width, key widths, joint coverage, (coverage of each field alone))]
+def sweep_key_widths(profile, layout, compressed_widths=(COMPRESSED_WIDTH,), max_key_width=MAX_KEY_WIDTH):
+    curves = [field_coverage_curve(profile, ranges) for ranges in layout]
+    splits = [(compressed_width, key_width_splits(layout, compressed_width, max_key_width))
+              for compressed_width in compressed_widths]
+    joint = split_coverage(profile, layout, np.concatenate([widths for compressed_width, widths in splits]),
+                           max_key_width).tolist()
+    results = []
+    for compressed_width, widths_of_width in splits:
+        for widths in widths_of_width.tolist():
+            marginal = tuple(field_coverage(curve, width) for curve, width in zip(curves, widths))
+            results.append((compressed_width, tuple(widths), joint[len(results)], marginal))
+    return results
+
+# Best key widths for a layout: (coverage, key widths), the smallest dictionaries winning ties
+def best_key_widths(profile, layout, compressed_width=COMPRESSED_WIDTH, max_key_width=MAX_KEY_WIDTH):
+    splits = key_width_splits(layout, compressed_width, max_key_width)
+    if len(splits) == 0:
+        return 0.0, None
+    covered = split_coverage(profile, layout, splits, max_key_width)
+    storage = [dictionary_bits(layout, widths) for widths in splits.tolist()]
+    best = min(range(len(splits)), key=lambda i: (-covered[i], storage[i]))
+    return float(covered[best]), tuple(splits[best].tolist())
+
+# Ranks candidate layouts by the fraction of dynamic instructions they make fully compressible
+# Candidates are layouts (key widths searched, most executed values in each dictionary) or
+# (layout, key widths) pairs, scored with the dictionaries profile_layout writes for them
+# Returns the [num_best] best as [(coverage, layout, key widths)]
+def explore(profile, candidates, compressed_width=COMPRESSED_WIDTH, num_best=10, max_key_width=MAX_KEY_WIDTH):
+    results = []
+    for candidate in candidates:
+        if isinstance(candidate[-1][0], tuple):
+            layout = candidate
+            covered, key_widths = best_key_widths(profile, layout, compressed_width, max_key_width)
+        else:
+            layout, key_widths = candidate
+            covered = written_coverage(profile, layout, key_widths)
+        if key_widths is not None:
+            results.append((covered, layout, tuple(key_widths)))
+    results.sort(key=lambda result: (-result[0], dictionary_bits(result[1], result[2])))
+    return results[:num_best]
+
+def print_results(results, title):
+    print("############################################")
+    print(title)
+    print("coverage   key widths   dict bits   layout")
+    for covered, layout, key_widths in results:
+        print("%.4f    " % covered, "%-12s" % "/".join(str(width) for width in key_widths),
+              "%-10d" % dictionary_bits(layout, key_widths), layout_name(layout))
+    print("############################################")
+
+def main():
+    filename = sys.argv[1]
+    num_fields = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    compressed_width = int(sys.argv[3]) if len(sys.argv) > 3 else COMPRESSED_WIDTH
+
+    instructions_all, num_instructions, max_pc = parse_assembly_file(filename)
+    profile = FieldProfile(instructions_all, ())
+
+    print_results(explore(profile, [(NAIVE_R_TYPE, NAIVE_R_TYPE_KEY_WIDTHS),
+                                    (NAIVE_I_TYPE, NAIVE_I_TYPE_KEY_WIDTHS)], compressed_width),
+                  "Hard-wired layouts")
+    print_results(explore(profile, [NAIVE_R_TYPE, NAIVE_I_TYPE], compressed_width),
+                  "Hard-wired layouts, best key widths")
+    print_results(explore(profile, contiguous_layouts(num_fields), compressed_width),
+                  "Best " + str(num_fields) + " field contiguous layouts")
+
+if __name__ == "__main__":
+    main()
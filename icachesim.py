@@ -0,0 +1,202 @@
+import sys
+import numpy as np
+from tracecache import load_trace
+
+# Trace driven model of verilog/icache_Xwa_wide.v, to screen cache configurations without simv
+# The fetch stream is the PC of every executed instruction in a trace (see tracecache.py).
+# icache_Xwa_wide splits an address into tag | index | block offset | 2 byte offset bits and
+# replaces the ways of a set round robin (replace[index] moves on after every fill), so a set
+# behaves as a FIFO of its last NUM_WAYS missed lines: hits never change its state.
+# That makes most of the work vectorizable:
+#   - consecutive fetches from the same line are hits (the line was just used)
+#   - once the fetches are grouped by set (keeping their order), consecutive fetches of the
+#     same line within a set are hits as well
+# and only what's left, the fetches that move to another line of their set, goes through the
+# per set FIFO loop. For loops that fit in the cache that's a tiny fraction of the trace.
+# Statistics are reported the way testbench_controller.v counts them:
+#   misses = line fills, hits = accesses - misses, Imem Accesses = NUM_BLOCKS words per fill
+# simulate_icache models the regular cache on its own (nothing compressible) and
+# simulate_controller the regular and compressed caches of controller.v together.
+
+# Defaults of controller.v
+CACHE_SIZE = 4*1024
+NUM_WAYS   = 4
+NUM_BLOCKS = 4
+BLOCK_SIZE = 4
+CACHE_SIZE_COMP = 512
+BLOCK_SIZE_COMP = 2
+
+BYTE_OFFSET_BITS = 2
+
+def clog2(value):
+    return (int(value) - 1).bit_length()
+
+# Returns (number of sets, index bits, offset bits) of a cache, like the localparams of the module
+def cache_geometry(cache_size=CACHE_SIZE, num_ways=NUM_WAYS, num_blocks=NUM_BLOCKS, block_size=BLOCK_SIZE):
+    num_lines = cache_size // (num_blocks * block_size)
+    if num_lines == 0 or num_lines % num_ways != 0:
+        raise ValueError("%d B cache can't hold %d ways of %d x %d B lines" % (cache_size, num_ways, num_blocks, block_size))
+    num_sets = num_lines // num_ways
+    return num_sets, clog2(num_sets), clog2(num_blocks)
+
+# PCs the processor fetches, in order: every executed instruction of a trace
+# (the extra address line of a load/store isn't a fetch)
+def fetch_addresses(trace):
+    return np.asarray(trace["pc"])[~np.asarray(trace["is_addr"])]
+
+# Mask of the entries that differ from the one before them
+def run_starts(values):
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    return starts
+
+# Groups the line addresses of a fetch stream by set, dropping the fetches that are certain hits
+# Returns (set of each remaining fetch, tag of each), sorted by set with the fetch order kept
+def set_streams(lines, num_sets, index_bits):
+    lines = lines[run_starts(lines)]
+    sets = (lines & np.uint32(num_sets - 1)).astype(np.uint16 if num_sets <= 1 << 16 else np.uint32)
+    order = np.argsort(sets, kind="stable")
+    sets = sets[order]
+    tags = lines[order] >> np.uint32(index_bits)
+    keep = run_starts(tags) | run_starts(sets)
+    return sets[keep], tags[keep]
+
+# Replays the per set streams through round robin sets of [num_ways] ways
+# Returns (misses, valid lines left in the cache)
+def simulate_sets(sets, tags, num_sets, num_ways):
+    misses = 0
+    occupancy = 0
+    bounds = np.searchsorted(sets, np.arange(num_sets + 1)).tolist()
+    tag_list = tags.tolist()
+    for set_idx in range(num_sets):
+        ways = []
+        present = set()
+        replace = 0
+        for tag in tag_list[bounds[set_idx]:bounds[set_idx + 1]]:
+            if tag in present:
+                continue
+            misses += 1
+            if len(ways) < num_ways:
+                ways.append(tag)
+            else:
+                present.discard(ways[replace])
+                ways[replace] = tag
+                replace = (replace + 1) % num_ways
+            present.add(tag)
+        occupancy += len(ways)
+    return misses, occupancy
+
+# Replays a stream of line addresses through round robin sets
+# Returns (misses, valid lines left in the cache)
+def simulate_lines(lines, num_sets, index_bits, num_ways):
+    sets, tags = set_streams(lines, num_sets, index_bits)
+    return simulate_sets(sets, tags, num_sets, num_ways)
+
+# Line address (PC without its block and byte offset bits) of every fetch
+def line_addresses(pcs, num_blocks=NUM_BLOCKS):
+    return np.asarray(pcs, dtype=np.uint32) >> np.uint32(clog2(num_blocks) + BYTE_OFFSET_BITS)
+
+def cache_stats(accesses, misses, occupancy):
+    return {
+        "hits": accesses - misses,
+        "misses": misses,
+        "miss_rate": misses / accesses if accesses else 0.0,
+        "occupancy": occupancy,
+    }
+
+# Imem Accesses as testbench_controller.v counts them: its imem is 32 bits wide, so every line
+# fill is [num_blocks] word reads
+def imem_accesses(fills, num_blocks):
+    return fills * num_blocks
+
+# Runs a fetch stream through an icache_Xwa_wide with the given parameters
+# Every miss is a line fill, counted in imem_accesses like simulate_controller counts its fills
+# Returns {"accesses", "hits", "misses", "miss_rate", "occupancy", "imem_accesses"}
+def simulate_icache(pcs, cache_size=CACHE_SIZE, num_ways=NUM_WAYS, num_blocks=NUM_BLOCKS, block_size=BLOCK_SIZE):
+    num_sets, index_bits, offset_bits = cache_geometry(cache_size, num_ways, num_blocks, block_size)
+    misses, occupancy = simulate_lines(line_addresses(pcs, num_blocks), num_sets, index_bits, num_ways)
+    stats = cache_stats(len(pcs), misses, occupancy)
+    stats["accesses"] = len(pcs)
+    stats["imem_accesses"] = imem_accesses(misses, num_blocks)
+    return stats
+
+# Whether every word of each line is compressible, from a per word bitmap of the memory image
+# (word i at address 4*i, as profilecachelines.py builds it); lines past the bitmap aren't
+def compressible_lines(lines, compressible, num_blocks=NUM_BLOCKS):
+    bitmap = np.asarray(compressible, dtype=bool)
+    num_lines = -(-len(bitmap) // num_blocks)
+    padded = np.zeros(num_lines * num_blocks + 1, dtype=bool)
+    padded[:len(bitmap)] = bitmap
+    line_ok = np.append(padded[:-1].reshape(num_lines, num_blocks).all(axis=1), False)
+    return line_ok[np.minimum(lines, num_lines)]
+
+# Runs a fetch stream through the two caches of controller.v: icache_Xwa_wide next to a fully
+# associative icache_FAwa_wide_comp
+# Both caches are looked up on every fetch. When both miss, the controller reads the line one word
+# at a time and hands it to the compressed cache if every word compressed, to the regular one
+# otherwise, so a line only ever lives in one of them and each cache just sees the fetches of
+# its own lines. Like testbench_controller.v, a cache counts a miss on every fetch it doesn't
+# serve itself, and the combined misses are the fetches neither serves (= line fills).
+# Returns {"accesses", "icache": stats, "comp": stats, "combined": stats, "imem_accesses"}
+def simulate_controller(pcs, compressible, cache_size=CACHE_SIZE, num_ways=NUM_WAYS, num_blocks=NUM_BLOCKS,
+                        block_size=BLOCK_SIZE, cache_size_comp=CACHE_SIZE_COMP, block_size_comp=BLOCK_SIZE_COMP):
+    num_sets, index_bits, offset_bits = cache_geometry(cache_size, num_ways, num_blocks, block_size)
+    num_lines_comp = cache_size_comp // (num_blocks * block_size_comp)
+    cache_geometry(cache_size_comp, num_lines_comp, num_blocks, block_size_comp)
+
+    lines = line_addresses(pcs, num_blocks)
+    to_comp = compressible_lines(lines, compressible, num_blocks)
+    lines_comp = lines[to_comp]
+    lines_reg = lines[~to_comp]
+    misses_reg, occupancy_reg = simulate_lines(lines_reg, num_sets, index_bits, num_ways)
+    misses_comp, occupancy_comp = simulate_lines(lines_comp, 1, 0, num_lines_comp)
+
+    accesses = len(lines)
+    fills = misses_reg + misses_comp
+    return {
+        "accesses": accesses,
+        "icache": cache_stats(accesses, accesses - (len(lines_reg) - misses_reg), occupancy_reg),
+        "comp": cache_stats(accesses, accesses - (len(lines_comp) - misses_comp), occupancy_comp),
+        "combined": cache_stats(accesses, fills, occupancy_reg + occupancy_comp),
+        "imem_accesses": imem_accesses(fills, num_blocks),
+    }
+
+# Prints the stats in the same terms as testbench_controller.v
+def print_icache_stats(stats):
+    print("\nProcessor Cache Accesses: %d\n" % stats["accesses"])
+    print("Icache Statistics:")
+    print("Hits: %d, Misses: %d" % (stats["hits"], stats["misses"]))
+    print("Icache Miss rate: %f" % stats["miss_rate"])
+    print("Icache occupancy: %d\n" % stats["occupancy"])
+    print("Imem Accesses: %d\n" % stats["imem_accesses"])
+
+# Prints the stats of simulate_controller like testbench_controller.v
+def print_controller_stats(stats):
+    print("\nProcessor Cache Accesses: %d\n" % stats["accesses"])
+    print("Icache Statistics:")
+    print("Hits: %d, Misses: %d" % (stats["icache"]["hits"], stats["icache"]["misses"]))
+    print("Icache Miss rate: %f" % stats["icache"]["miss_rate"])
+    print("Icache occupancy: %d\n" % stats["icache"]["occupancy"])
+    print("\nCompressed Icache Statistics:")
+    print("Hits: %d, Misses: %d" % (stats["comp"]["hits"], stats["comp"]["misses"]))
+    print("Compressed Icache Miss rate: %f" % stats["comp"]["miss_rate"])
+    print("Compressed Icache Occupancy: %d\n" % stats["comp"]["occupancy"])
+    print("\nCombined cache Statistics:")
+    print("Hits: %d, Misses: %d" % (stats["combined"]["hits"], stats["combined"]["misses"]))
+    print("Miss rate: %f\n" % stats["combined"]["miss_rate"])
+    print("Imem Accesses: %d\n" % stats["imem_accesses"])
+
+# usage: python3 icachesim.py <trace> [CACHE_SIZE NUM_WAYS NUM_BLOCKS BLOCK_SIZE]
+def main():
+    filename = sys.argv[1]
+    params = [int(arg) for arg in sys.argv[2:6]]
+    cache_size, num_ways, num_blocks, block_size = params + [CACHE_SIZE, NUM_WAYS, NUM_BLOCKS, BLOCK_SIZE][len(params):]
+
+    pcs = fetch_addresses(load_trace(filename))
+    print("############################################")
+    print("CACHE_SIZE = %d, NUM_WAYS = %d, NUM_BLOCKS = %d, BLOCK_SIZE = %d" % (cache_size, num_ways, num_blocks, block_size))
+    print_icache_stats(simulate_icache(pcs, cache_size, num_ways, num_blocks, block_size))
+    print("############################################")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import numpy as np
+
+# Integer backend for the bitfield profilers
+# Instructions are held as a uint32 array (with a matching array of dynamic counts)
+# and every field is pulled out of the whole array at once with shifts and masks.
+# Fields are described as tuples of (end, start) bit ranges, concatenated MSB first,
+# the same way the get_* string helpers in profilebitfields.py build them.
+
+OPCODE          = ((6, 0),)
+FUNCT3          = ((14, 12),)
+FUNCT7          = ((31, 25),)
+RS1             = ((19, 15),)
+RS2             = ((24, 20),)
+RD              = ((11, 7),)
+FUNCT7_FUNCT3   = ((31, 25), (14, 12))
+REGISTERS       = ((24, 20), (19, 15), (11, 7))
+IMM_I_TYPE      = ((31, 20),)
+RS1_FUNCT3_RD   = ((19, 15), (14, 12), (11, 7))
+IMM_UJ          = ((31, 12),)
+WORD            = ((31, 0),)
+
+# Field layouts of the compressed formats (field1, field2, field3)
+NAIVE_R_TYPE = (OPCODE, FUNCT7_FUNCT3, REGISTERS)
+NAIVE_I_TYPE = (OPCODE, IMM_I_TYPE, RS1_FUNCT3_RD)
+
+# Returns (words, counts) arrays for a dict of {binary string: count}
+def to_words(instructions):
+    words = np.fromiter((int(instr, 2) for instr in instructions), dtype=np.uint32, count=len(instructions))
+    counts = np.fromiter(instructions.values(), dtype=np.int64, count=len(instructions))
+    return words, counts
+
+def field_width(ranges):
+    return sum(end - start + 1 for end, start in ranges)
+
+def extract_bits(words, end, start):
+    mask = (1 << (end - start + 1)) - 1
+    return (words >> np.uint32(start)) & np.uint32(mask)
+
+# Concatenates the bit ranges of a field into one integer per instruction
+def extract_field(words, ranges):
+    value = np.zeros(len(words), dtype=np.uint32)
+    for end, start in ranges:
+        value = (value << np.uint32(end - start + 1)) | extract_bits(words, end, start)
+    return value
+
+# Formats field values as the zero padded binary strings used as dictionary keys
+def to_bitstrings(values, width):
+    return [format(value, "0%db" % width) for value in values.tolist()]
+
+# Accumulates [counts] per distinct field value, keeping the values in the order they
+# first appear in [values]
+# With [max_entries], stops at the first value that would exceed max_entries distinct
+# values (the same cut-off the dictionary writers have always used)
+def field_counts(values, counts, max_entries=None):
+    if len(values) == 0:
+        return values, counts
+    unique, first_idx, inverse = np.unique(values, return_index=True, return_inverse=True)
+    if max_entries is not None and len(unique) > max_entries:
+        cutoff = np.sort(first_idx)[max_entries]
+        return field_counts(values[:cutoff], counts[:cutoff])
+    totals = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+    order = np.argsort(first_idx, kind="stable")
+    return unique[order], totals[order]
+
+# Returns {binary string: count} for a field of the given instructions
+def field_histogram(words, counts, ranges, max_entries=None):
+    values, totals = field_counts(extract_field(words, ranges), counts, max_entries)
+    return dict(zip(to_bitstrings(values, field_width(ranges)), totals.tolist()))
+
+# Returns a boolean mask of instructions whose opcode maps to one of [formats]
+def format_mask(words, opcode_to_format, formats):
+    table = np.zeros(1 << 7, dtype=bool)
+    for opcode, fmt in opcode_to_format.items():
+        if fmt in formats:
+            table[int(opcode, 2)] = True
+    return table[extract_field(words, OPCODE)]
+
+# Every field histogram of a weighted unique-instruction table, computed in one pass
+# Rows keep the order of the table (most executed first, as parse_assembly_file returns it),
+# so the histogram of the top N instructions is just the histogram of the first N rows and
+# every layout / cut-off is answered from the same per-field arrays.
+class FieldProfile:
+    def __init__(self, instructions, layouts=(NAIVE_R_TYPE, NAIVE_I_TYPE)):
+        self.words, self.counts = to_words(instructions)
+        self.fields = {}
+        self.rankings = {}
+        for layout in layouts:
+            for ranges in layout:
+                self.field(ranges)
+
+    # A profile of (words, counts) arrays, e.g. from to_words
+    @classmethod
+    def from_words(cls, words, counts, layouts=()):
+        profile = cls({}, ())
+        profile.words = np.asarray(words, dtype=np.uint32)
+        profile.counts = np.asarray(counts, dtype=np.int64)
+        for layout in layouts:
+            for ranges in layout:
+                profile.field(ranges)
+        return profile
+
+    def __len__(self):
+        return len(self.words)
+
+    # What the result cache hashes a profile by (see resultcache.py)
+    def cache_key(self):
+        return self.words, self.counts
+
+    # Distinct values of a field with, for each, the row it first shows up in and
+    # the distinct value of every row
+    def field(self, ranges):
+        if ranges not in self.fields:
+            values = extract_field(self.words, ranges)
+            unique, first_idx, inverse = np.unique(values, return_index=True, return_inverse=True)
+            by_first = np.argsort(first_idx, kind="stable")
+            self.fields[ranges] = (unique, inverse.ravel(), by_first, first_idx[by_first])
+        return self.fields[ranges]
+
+    def num_rows(self, top=None):
+        if top is None or top < 0:
+            return len(self.words)
+        return min(top, len(self.words))
+
+    def total_count(self, top=None):
+        return int(self.counts[:self.num_rows(top)].sum())
+
+    # Count of the top instructions whose opcode maps to one of [formats]
+    def format_count(self, opcode_to_format, formats, top=None):
+        rows = self.num_rows(top)
+        mask = format_mask(self.words[:rows], opcode_to_format, formats)
+        return int(self.counts[:rows][mask].sum())
+
+    # Returns {binary string: count} of a field over the top [top] instructions, in order of
+    # first appearance, cut off like field_histogram when [max_entries] is given
+    def histogram(self, ranges, top=None, max_entries=None):
+        unique, inverse, by_first, first_sorted = self.field(ranges)
+        rows = self.num_rows(top)
+        if max_entries is not None and len(first_sorted) > max_entries:
+            rows = min(rows, int(first_sorted[max_entries]))
+        num_values = int(np.searchsorted(first_sorted, rows))
+        ids = by_first[:num_values]
+        totals = np.bincount(inverse[:rows], weights=self.counts[:rows], minlength=len(unique))
+        return dict(zip(to_bitstrings(unique[ids], field_width(ranges)),
+                        totals[ids].astype(np.int64).tolist()))
+
+    # Distinct values of a field ranked most executed first (ties: first appearance), as
+    # (values in rank order, rank of every row's value)
+    def ranking(self, ranges):
+        if ranges not in self.rankings:
+            unique, inverse, by_first, first_sorted = self.field(ranges)
+            totals = np.bincount(inverse, weights=self.counts, minlength=len(unique))
+            first_idx = np.empty(len(unique), dtype=np.int64)
+            first_idx[by_first] = first_sorted
+            order = np.lexsort((first_idx, -totals))
+            rank = np.empty(len(unique), dtype=np.int64)
+            rank[order] = np.arange(len(unique))
+            self.rankings[ranges] = (unique[order], rank[inverse])
+        return self.rankings[ranges]
+
+    # Key width each row needs for its value of a field to make it into a dictionary of the
+    # most executed values of that field: a value of rank r needs ceil(log2(r + 1)) bits
+    def key_bits(self, ranges):
+        values, rank = self.ranking(ranges)
+        return np.ceil(np.log2(rank + 1)).astype(np.int64)
+
+    # The 2^[key_width] most executed values of a field as binary strings
+    def dictionary(self, ranges, key_width):
+        values, rank = self.ranking(ranges)
+        return to_bitstrings(values[:2**key_width], field_width(ranges))
+
+    # The first [max_entries] distinct values of a field in order of first appearance (the
+    # values of histogram(ranges, max_entries=...))
+    def first_values(self, ranges, max_entries):
+        unique, inverse, by_first, first_sorted = self.field(ranges)
+        return unique[by_first[:max_entries]]
+
+# Dynamic coverage of the N most executed unique instructions, for every N at once
+# Built with one sort and one prefix sum over the counts; any cut-off (or every cut-off) is then
+# a lookup into the cumulative counts, so nothing has to be trimmed or copied to ask about it.
+class CoverageCurve:
+    def __init__(self, counts, total=None):
+        counts = np.asarray(counts, dtype=np.int64)
+        self.cumulative = np.cumsum(np.sort(counts, kind="stable")[::-1])
+        # [total] is the number of executed instructions when [counts] doesn't cover all of them
+        if total is None:
+            total = int(self.cumulative[-1]) if len(counts) else 0
+        self.total = total
+
+    def __len__(self):
+        return len(self.cumulative)
+
+    # Executed count of the [top] most executed unique instructions ([top] an int or an array)
+    def executed(self, top=None):
+        if top is None:
+            top = len(self.cumulative)
+        top = np.minimum(top, len(self.cumulative))
+        padded = np.concatenate(([0], self.cumulative))
+        executed = padded[top]
+        return int(executed) if np.ndim(executed) == 0 else executed
+
+    # Fraction of all executed instructions that are among the [top] most executed unique ones
+    def coverage(self, top=None):
+        if self.total == 0:
+            return 0.0 if np.ndim(top) == 0 else np.zeros(np.shape(top))
+        executed = self.executed(top)
+        return executed / self.total
+
+    # (N, executed count, coverage) for every N from 1 to the number of unique instructions
+    def points(self):
+        tops = np.arange(1, len(self.cumulative) + 1)
+        return tops, self.cumulative, self.coverage(tops)
+
+# Reads a dictionary written for $readmemb (one binary value per line, in key order)
+def read_dictionary(filename):
+    with open(filename, 'r') as file:
+        return np.array([int(line, 2) for line in file if line.strip()], dtype=np.uint32)
+
+# Writes the dictionaries of a layout (one array of values per field, in key order) for
+# $readmemb to profiling/field<n>_<filename>.mem
+def write_dictionaries(dictionaries, layout, filename):
+    for num, (ranges, dictionary) in enumerate(zip(layout, dictionaries)):
+        with open("profiling/field" + str(num + 1) + "_" + filename + ".mem", 'w') as file:
+            for entry in to_bitstrings(np.asarray(dictionary, dtype=np.uint32), field_width(ranges)):
+                file.write(entry + "\n")
+
+# The dictionaries of a layout taken from a FieldProfile: the 2^key_width most executed values
+# of each field
+def profile_dictionaries(profile, layout, key_widths):
+    return [profile.ranking(ranges)[0][:2**key_width] for ranges, key_width in zip(layout, key_widths)]
+
+# The dictionaries profile_layout writes for a layout (field<n>_<R|I>_<prog>.mem, what simv_cont
+# loads): the first 2^key_width values of each field in the order of the profile's rows
+def layout_dictionaries(profile, layout, key_widths):
+    return [profile.first_values(ranges, 2**key_width) for ranges, key_width in zip(layout, key_widths)]
+
+# Dictionary lookups of field columns for one or more candidate dictionaries at once
+# [columns] holds the values of each field (one array per field, all the same length) and
+# [candidates] is a list of dictionaries, each a list of value arrays (one per field).
+# Each column is matched once against the sorted union of that field's values over every
+# candidate, so comparing candidates doesn't scan the columns again.
+# Returns (hits, compressible): hits[c, f] masks the entries whose field f is in field f of
+# candidate c, compressible[c] the entries with every field in candidate c
+def dictionary_hits(columns, candidates):
+    num_entries = len(columns[0]) if len(columns) else 0
+    hits = np.zeros((len(candidates), len(columns), num_entries), dtype=bool)
+    for field, values in enumerate(columns):
+        values = np.asarray(values, dtype=np.uint32)
+        union = np.unique(np.concatenate([np.asarray(candidate[field], dtype=np.uint32) for candidate in candidates]
+                                         + [np.zeros(0, dtype=np.uint32)]))
+        # index into the union, len(union) for values that aren't in it
+        pos = np.searchsorted(union, values)
+        found = pos < len(union)
+        found[found] = union[pos[found]] == values[found]
+        pos[~found] = len(union)
+        for num, candidate in enumerate(candidates):
+            in_candidate = np.zeros(len(union) + 1, dtype=bool)
+            in_candidate[np.searchsorted(union, np.asarray(candidate[field], dtype=np.uint32))] = True
+            hits[num, field] = in_candidate[pos]
+    return hits, hits.all(axis=1)
@@ -0,0 +1,58 @@
+import sys
+from fieldexplorer import *
+
+# Sweeps the key widths of the hard-wired dictionary layouts (every split of 12..20 compressed
+# bits), prints the joint coverage of each and writes the dictionaries of the best 16 bit split
+# to profiling/field<n>_<R|I>_best_<program>.mem, with the FIELD*_KEY_WIDTH values for controller.v
+
+COMPRESSED_WIDTHS = range(12, 21)
+
+LAYOUTS = [
+    ("R", NAIVE_R_TYPE, NAIVE_R_TYPE_KEY_WIDTHS),
+    ("I", NAIVE_I_TYPE, NAIVE_I_TYPE_KEY_WIDTHS),
+]
+
+def format_widths(widths):
+    return "/".join(str(width) for width in widths)
+
+def print_sweep(results, layout, key_widths, limit=10):
+    print("key widths   joint      per field")
+    results = sorted(results, key=lambda result: (-result[2], dictionary_bits(layout, result[1])))
+    for compressed_width, widths, joint, marginal in results[:limit]:
+        print("%-12s" % format_widths(widths), "%.4f    " % joint, " ".join("%.4f" % field for field in marginal))
+    for compressed_width, widths, joint, marginal in results:
+        if list(widths) == list(key_widths):
+            print("current " + format_widths(widths) + ": %.4f" % joint)
+    return results[0] if results else None
+
+def main():
+    filename = sys.argv[1]
+    program_name = filename.split("output/")[-1].replace(".trace_dump", "").replace(".trace", "")
+
+    instructions_all, num_instructions, max_pc = parse_assembly_file(filename)
+    profile = FieldProfile(instructions_all, ())
+
+    for name, layout, key_widths in LAYOUTS:
+        results = sweep_key_widths(profile, layout, COMPRESSED_WIDTHS)
+
+        print("############################################")
+        print(name + " layout: " + layout_name(layout))
+        print("compressed width   best key widths   joint coverage")
+        for compressed_width in COMPRESSED_WIDTHS:
+            best = max((result for result in results if result[0] == compressed_width),
+                       key=lambda result: (result[2], -dictionary_bits(layout, result[1])), default=None)
+            if best is not None:
+                print("%-18d" % compressed_width, "%-17s" % format_widths(best[1]), "%.4f" % best[2])
+        print("============================================")
+        print("Top " + str(COMPRESSED_WIDTH) + " bit splits")
+        best = print_sweep([result for result in results if result[0] == COMPRESSED_WIDTH], layout, key_widths)
+        print("============================================")
+
+        if best is not None:
+            write_dictionaries(profile_dictionaries(profile, layout, best[1]), layout, name + "_best_" + program_name)
+            for num, width in enumerate(best[1]):
+                print("parameter FIELD" + str(num + 1) + "_KEY_WIDTH = " + str(width) + ",")
+        print("############################################")
+
+if __name__ == "__main__":
+    main()
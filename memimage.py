@@ -0,0 +1,95 @@
+import numpy as np
+import npzcache
+from npzcache import save_npz, load_npz
+from tracedecode import HEX_VALUES
+from instrfields import extract_field, to_bitstrings, field_width
+
+# Memory images (programs/<prog>.mem, .mem2w, .mem4w) as uint32 word arrays
+# ELF2HEX writes one hex line per 4, 8 or 16 bytes of memory (the lowest address word last on the
+# line) for the whole 32768 line image; almost all of it is zero padding after the program.
+# The words are parsed in one vectorized pass and cached next to the image as <mem>.npz (keyed on
+# its size and mtime, see npzcache.py), so later loads just map the array.
+
+MEM_VERSION = 1
+
+def cache_path(filename):
+    return filename + ".npz"
+
+# Parses the hex lines of a memory image into words, in address order
+def parse_mem_image(filename):
+    with open(filename, 'rb') as file:
+        data = file.read()
+    lines = data.split(b"\n", 1)
+    digits_per_line = len(lines[0].strip())
+    line_len = digits_per_line + 1
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if digits_per_line % 8 == 0 and digits_per_line > 0 and len(buf) % line_len == 0:
+        rows = buf.reshape(-1, line_len)
+        digits = HEX_VALUES[rows[:, :-1]]
+        if (rows[:, -1] == ord("\n")).all() and (digits >= 0).all():
+            # (lines, words per line, 8 digits), lowest address word last on the line
+            digits = digits.reshape(len(rows), -1, 8)[:, ::-1, :].astype(np.uint32)
+            words = np.zeros(digits.shape[:2], dtype=np.uint32)
+            for col in range(8):
+                words = (words << np.uint32(4)) | digits[:, :, col]
+            return words.ravel()
+    # odd line lengths or line endings: one line at a time
+    words = []
+    for line in data.split():
+        value = int(line.replace(b"x", b"0"), 16)
+        for word in range(max(len(line) // 8, 1)):
+            words.append((value >> (32 * word)) & 0xffffffff)
+    return np.array(words, dtype=np.uint32)
+
+# Loads the words of a memory image through its cache, parsing (and caching) it on first use
+def load_mem_image(filename, mmap=True):
+    key = npzcache.source_key(MEM_VERSION, filename)
+    arrays = load_npz(cache_path(filename), key, mmap)
+    if arrays is not None:
+        return arrays["words"]
+    words = parse_mem_image(filename)
+    try:
+        save_npz(cache_path(filename), key, {"words": words})
+    except OSError as e:
+        print("Could not write memory image cache for " + filename + ": " + str(e))
+    return words
+
+# Number of words up to the last non zero one; everything after it is padding
+def image_extent(words):
+    nonzero = np.flatnonzero(words)
+    return int(nonzero[-1]) + 1 if len(nonzero) else 0
+
+# The code of a memory image: the words from address 0 up to [max_pc] (the highest executed PC),
+# or up to the end of the non zero part of the image without it
+# Field columns of any layout are extracted from the whole code array at once and kept.
+class MemImage:
+    def __init__(self, filename, max_pc=None, mmap=True):
+        self.words = load_mem_image(filename, mmap)
+        self.extent = image_extent(self.words)
+        if max_pc is None:
+            self.num_words = self.extent
+        else:
+            self.num_words = min(max_pc // 4 + 1, len(self.words))
+        self.code = self.words[:self.num_words]
+        self.fields = {}
+
+    def __len__(self):
+        return self.num_words
+
+    # Whether each code word lies in the zero padding after the image contents
+    def padding(self):
+        return np.arange(self.num_words) >= self.extent
+
+    # Values of a field for every code word
+    def field(self, ranges):
+        if ranges not in self.fields:
+            self.fields[ranges] = extract_field(self.code, ranges)
+        return self.fields[ranges]
+
+    # Columns of every field of [layout]
+    def layout_fields(self, layout):
+        return [self.field(ranges) for ranges in layout]
+
+    # A field (or the whole word, for ranges ((31, 0),)) as the binary strings the profilers use
+    def bitstrings(self, ranges):
+        return to_bitstrings(self.field(ranges), field_width(ranges))
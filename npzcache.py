@@ -0,0 +1,69 @@
+import os
+import struct
+import zipfile
+import numpy as np
+
+# Small helpers for the .npz caches kept next to the files they were built from
+# (trace caches, disassembly indexes, memory images)
+# Every cache stores a "source_key" member: the cache format version followed by the size
+# and mtime of each source file. A cache whose key doesn't match is ignored and rebuilt.
+# Members are stored uncompressed so they can be memory mapped straight out of the archive.
+
+def source_key(version, *filenames):
+    key = [version]
+    for filename in filenames:
+        stat = os.stat(filename)
+        key += [stat.st_size, stat.st_mtime_ns]
+    return np.array(key, dtype=np.int64)
+
+def save_npz(path, key, arrays):
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, source_key=key, **arrays)
+    os.replace(tmp_path, path)
+
+# Maps every member of an uncompressed .npz straight from disk
+def memmap_npz(path):
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            file.seek(info.header_offset)
+            header = file.read(30)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            file.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject or 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(),
+                                     shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+# Returns every array stored in [path] (source_key included), or None if it can't be read
+def read_npz(path, mmap=True):
+    if not os.path.exists(path):
+        return None
+    try:
+        arrays = memmap_npz(path) if mmap else None
+        if arrays is None:
+            with np.load(path) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+    return arrays
+
+# Returns the arrays stored in [path], or None if it's missing, unreadable or its key isn't [key]
+def load_npz(path, key, mmap=True):
+    arrays = read_npz(path, mmap)
+    if arrays is None:
+        return None
+    cached_key = arrays.pop("source_key", None)
+    if cached_key is None or not np.array_equal(cached_key, key):
+        return None
+    return arrays
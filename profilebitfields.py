@@ -1,5 +1,8 @@
 import sys
 import math
+from instrfields import *
+from tracecache import load_trace, count_executed_instructions, trace_sources
+from resultcache import memoize
 
 riscv_opcode_to_format_extra = {
     '0110011': 'R(add)',  # R-type (e.g., arithmetic operations)
@@ -28,55 +31,27 @@ riscv_opcode_to_format = {
 }
 
 # Returns list of all unique instructions in a program sorted by count based on the provided trace
+@memoize(inputs=lambda args: trace_sources(args["filename"]))
 def parse_assembly_file(filename):
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-
-    assembly_start = False
-    instructions = []
-    max_pc = 0
-    for line in lines:
-        if "MEMACCES/REGWRITE" in line:
-            assembly_start = True
-            continue
-
-        if assembly_start:
-            if not line.strip():
-                continue
-
-            parts = [part.strip() for part in line.split('|')]
-            if len(parts) < 4:
-                continue
-
-            if parts[0][0] != "@": #prevent double counting
-                instruction = bin(int(parts[2], 16))[2:].zfill(32)  # Convert to binary
-                max_pc = max(int(parts[1], 16), max_pc)
-                #print(instruction)
-                instructions.append(instruction)
+    # Columns come from the binary trace cache (built on first use)
+    instr_count, num_instructions, max_pc = count_executed_instructions(load_trace(filename))
+
     print("############################################")
     print("# instrs:")
-    print(len(instructions))
+    print(num_instructions)
     print("Max PC:")
     print(max_pc)
     print("Max PC (Hex): ")
     print(hex(max_pc))
     # count the instructions and return only the top [num_instrs] common
 
-    unique_instr = []
-    instr_count = {}
-    for instr in instructions: 
-        if instr not in unique_instr:
-            unique_instr.append(instr)
-            instr_count[instr] = 0
-        instr_count[instr] += 1
-
     print("# unique instrs:")
-    print(len(unique_instr))
+    print(len(instr_count))
 
     instr_count = sort_entries(instr_count)
     
     print("############################################")
-    return instr_count, len(instructions), max_pc
+    return instr_count, num_instructions, max_pc
 
 # Returns list of the top [num_instrs] in a program sorted by count based on the provided trace
 def trim_instructions(instructions, instruction_count, num_instrs=-1):
@@ -151,228 +126,61 @@ def get_funct7(instr):
 
 #######################################################3
 
-def get_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if opcode not in unique_opcodes:
-            unique_opcodes.append(opcode)
-            opcodes[opcode] = 0
-        opcodes[opcode] += instructions[instr]
-
-    return opcodes
+# Histogram of a bitfield (list of (end, start) bit ranges) over the weighted instructions,
+# restricted to the instructions whose type is in [formats] when given
+def get_bitfield_counts(instructions, ranges, max_entries=None, formats=None):
+    words, counts = to_words(instructions)
+    if formats is not None:
+        mask = format_mask(words, riscv_opcode_to_format, formats)
+        words = words[mask]
+        counts = counts[mask]
+    return field_histogram(words, counts, ranges, max_entries)
 
 def get_RISB_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] != 'U' and riscv_opcode_to_format[opcode] != 'J':
-            if opcode not in unique_opcodes:
-                unique_opcodes.append(opcode)
-                opcodes[opcode] = 0
-            opcodes[opcode] += instructions[instr]
-
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, formats="RISB")
 
 def get_R_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'R':
-            if opcode not in unique_opcodes:
-                unique_opcodes.append(opcode)
-                opcodes[opcode] = 0
-            opcodes[opcode] += instructions[instr]
-
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, formats="R")
 
 def get_I_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'I':
-            if opcode not in unique_opcodes:
-                unique_opcodes.append(opcode)
-                opcodes[opcode] = 0
-            opcodes[opcode] += instructions[instr]
-
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, formats="I")
 
 def get_S_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'S':
-            if opcode not in unique_opcodes:
-                unique_opcodes.append(opcode)
-                opcodes[opcode] = 0
-            opcodes[opcode] += instructions[instr]
-
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, formats="S")
 
 def get_B_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'B':
-            if opcode not in unique_opcodes:
-                unique_opcodes.append(opcode)
-                opcodes[opcode] = 0
-            opcodes[opcode] += instructions[instr]
-
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, formats="B")
 
 def get_UJ_opcodes(instructions):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'U' or riscv_opcode_to_format[opcode] == 'J':
-            if opcode not in unique_opcodes:
-                unique_opcodes.append(opcode)
-                opcodes[opcode] = 0
-            opcodes[opcode] += instructions[instr]
-
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, formats="UJ")
 
 def get_opcodes(instructions, max_entries=None):
-    unique_opcodes = []
-    opcodes = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if opcode not in unique_opcodes:
-            if max_entries is not None and len(unique_opcodes) >= max_entries:
-                break
-            unique_opcodes.append(opcode)
-            opcodes[opcode] = 0
-        opcodes[opcode] += instructions[instr]
-    return opcodes
+    return get_bitfield_counts(instructions, OPCODE, max_entries)
     
 def parse_funct7_funct3(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        bitfield = get_funct7_funct3(instr)
-        if bitfield not in unique_bitfields:
-            if max_entries is not None and len(unique_bitfields) >= max_entries:
-                break
-            unique_bitfields.append(bitfield)
-            bitfields[bitfield] = 0
-        bitfields[bitfield] += instructions[instr]
-    return bitfields
+    return get_bitfield_counts(instructions, FUNCT7_FUNCT3, max_entries)
 
 def parse_funct7_funct3_RISB(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] != 'U' and riscv_opcode_to_format[opcode] != 'J':
-            bitfield = get_funct7_funct3(instr)
-            if bitfield not in unique_bitfields:
-                if max_entries is not None and len(unique_bitfields) >= max_entries:
-                    break
-                unique_bitfields.append(bitfield)
-                bitfields[bitfield] = 0
-            bitfields[bitfield] += instructions[instr]
-    return bitfields
+    return get_bitfield_counts(instructions, FUNCT7_FUNCT3, max_entries, "RISB")
 
 def parse_registers(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        bitfield = get_register(instr)
-        if bitfield not in unique_bitfields:
-            if max_entries is not None and len(unique_bitfields) >= max_entries:
-                break
-            unique_bitfields.append(bitfield)
-            bitfields[bitfield] = 0
-        bitfields[bitfield] += instructions[instr]
-    return bitfields
+    return get_bitfield_counts(instructions, REGISTERS, max_entries)
 
 def parse_registers_RISB(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] != 'U' and riscv_opcode_to_format[opcode] != 'J':
-            bitfield = get_register(instr)
-            if bitfield not in unique_bitfields:
-                if max_entries is not None and len(unique_bitfields) >= max_entries:
-                    break
-                unique_bitfields.append(bitfield)
-                bitfields[bitfield] = 0
-            bitfields[bitfield] += instructions[instr]
-    return bitfields
+    return get_bitfield_counts(instructions, REGISTERS, max_entries, "RISB")
 
 def parse_immediate_UJ(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'U' or riscv_opcode_to_format[opcode] == 'J':
-            bitfield = get_bit_range(instr, 31, 12)
-            if bitfield not in unique_bitfields:
-                if max_entries is not None and len(unique_bitfields) >= max_entries:
-                    break
-                unique_bitfields.append(bitfield)
-                bitfields[bitfield] = 0
-            bitfields[bitfield] += instructions[instr]
-    return bitfields
+    return get_bitfield_counts(instructions, IMM_UJ, max_entries, "UJ")
 
 def parse_registers_UJ(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        opcode = get_opcode(instr)
-        if riscv_opcode_to_format[opcode] == 'U' or riscv_opcode_to_format[opcode] == 'J':
-            bitfield = get_bit_range(instr, 11, 7)
-            if bitfield not in unique_bitfields:
-                if max_entries is not None and len(unique_bitfields) >= max_entries:
-                    break
-                unique_bitfields.append(bitfield)
-                bitfields[bitfield] = 0
-            bitfields[bitfield] += instructions[instr]
-    return bitfields
+    return get_bitfield_counts(instructions, RD, max_entries, "UJ")
 
 # NAIVE_I_TYPE
 def parse_imm_I_type(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        bitfield = get_imm_I_type(instr)
-        if bitfield not in unique_bitfields:
-            if max_entries is not None and len(unique_bitfields) >= max_entries:
-                break
-            #print(upper, "        ", lower)
-            unique_bitfields.append(bitfield)
-            bitfields[bitfield] = 0
-        bitfields[bitfield] += instructions[instr]
-
-    return bitfields
+    return get_bitfield_counts(instructions, IMM_I_TYPE, max_entries)
 
 def parse_rs1_funct3_rd(instructions, max_entries=None):
-    unique_bitfields = []
-    bitfields = {}
-    for instr in instructions: 
-        rs1 = get_rs1(instr)
-        funct3 = get_funct3(instr)
-        rd = get_rd(instr)
-        bitfield = rs1 + funct3 + rd
-        if bitfield not in unique_bitfields:
-            if max_entries is not None and len(unique_bitfields) >= max_entries:
-                break
-            #print(upper, "        ", lower)
-            unique_bitfields.append(bitfield)
-            bitfields[bitfield] = 0
-        bitfields[bitfield] += instructions[instr]
-
-    return bitfields
+    return get_bitfield_counts(instructions, RS1_FUNCT3_RD, max_entries)
 
 #######################################################
 
@@ -546,145 +354,88 @@ def get_UJ_instr_ratio(instructions):
 
 #######################################################
 
-# NAIVE configuration (based on R-type instructions):
-# Split instructions into 3 fields:
-# 1. Opcodes [6:0]
-# 2. funct7 + funct3 [31:25][14:2]
-# 3. rs2 rs1 rd [24:15][11:7]
-def profile_NAIVE_R_TYPE(instructions, instructions_all={}, write_out=False, filename="NAIVE_R_TYPE"):
-
-    print("\nNAIVE_R_TYPE PROFILING\n")
-
-    # Uncomment to print out all the instructions
-    #print_instr_w_type(instructions)
-
-    #####################
-    ###### OPCODES ######
-    #####################
+# Prints the same ratios as get_instr_ratio for the top [top] instructions of a FieldProfile
+def print_instr_ratio(profile, top=None):
+    total_instr_count = profile.total_count(top)
+    for formats in ["R", "I", "S", "B", "UJ"]:
+        count = profile.format_count(riscv_opcode_to_format, formats, top)
+        print("# " + formats + " Instrs / # Instrs: %.3f" % (count/total_instr_count))
 
+# Prints how much of the executed instructions the top [num_instrs] unique ones make up
+# (what trim_instructions prints, read off a CoverageCurve)
+def print_coverage(curve, num_instrs, instruction_count):
+    print("\n############################################")
+    print("Top ",num_instrs, " unique # trimmed instructions")
+    print("# trimmmed instructions executed / # total executed instructions: ", curve.executed(num_instrs)/instruction_count)
+    print("############################################")
 
-    # Parse the opcodes
-    field1 = get_opcodes(instructions)
-    field1 = sort_entries(field1)
-    field1_bits = print_stats(field1, "[FIELD 1] opcodes[6:0]", 0)
-
-    #######################
-    ###### FUNCT7/3 #######
-    #######################
-    # Parse the registers
-    field2 = parse_funct7_funct3(instructions)
-    field2 = sort_entries(field2)
-    field2_bits = print_stats(field2, "[FIELD 2] funct7 + funct3 [31:25][14:2]", 0)
-
-    #######################
-    ###### REGISTERS ######
-    #######################
-    # Parse the registers
-    field3 = parse_registers(instructions)
-    field3 = sort_entries(field3)
-    field3_bits = print_stats(field3, "[FIELD 3] rs2 rs1 rd [24:15][11:7]", 0)
+# Writes the coverage of the top N unique instructions for every N as CSV
+def write_coverage_csv(curve, filename):
+    tops, executed, coverage = curve.points()
+    with open(filename, 'w') as file:
+        file.write("num_unique,executed,coverage\n")
+        for top, count, fraction in zip(tops.tolist(), executed.tolist(), coverage.tolist()):
+            file.write("%d,%d,%.6f\n" % (top, count, fraction))
+
+def layout_files(layout, filename):
+    return ["profiling/field" + str(num + 1) + "_" + filename + ".mem" for num in range(len(layout))]
+
+# Profiles the fields of [layout] over the top [top] instructions of a FieldProfile and, with
+# [write_out], writes the first 2^[key_widths] values of each field (over all instructions)
+# to profiling/field<n>_<filename>.mem
+@memoize(outputs=lambda args: layout_files(args["layout"], args["filename"]) if args["write_out"] else [])
+def profile_layout(profile, layout, titles, key_widths, top=None, write_out=False, filename="layout"):
+    field_bits = []
+    for num, ranges in enumerate(layout):
+        field = sort_entries(profile.histogram(ranges, top))
+        field_bits.append(print_stats(field, "[FIELD " + str(num + 1) + "] " + titles[num], 0))
 
     print("===================================================")
-    print("[FIELD 1]:", field1_bits)
-    print("[FIELD 2]:", field2_bits)
-    print("[FIELD 3]:", field3_bits)
-    print("[FIELD 1] + [FIELD 2] + [FIELD 3]: ", field1_bits + field2_bits + field3_bits)
+    for num, bits in enumerate(field_bits):
+        print("[FIELD " + str(num + 1) + "]:", bits)
+    print(" + ".join("[FIELD " + str(num + 1) + "]" for num in range(len(layout))) + ": ", sum(field_bits))
     print("===================================================")
 
-    field1_bits = 3
-    field2_bits = 5
-    field3_bits = 8
-    # Get the max # compressible fields (from all instructions) to fill up luts
-    field1_write = get_opcodes(instructions_all, 2**field1_bits)
-    #field1_write = sort_entries(field1_write)
+    if(write_out):
+        # Get the max # compressible fields (from all instructions) to fill up luts
+        for num, ranges in enumerate(layout):
+            field_write = profile.histogram(ranges, max_entries=2**key_widths[num])
+            with open(layout_files(layout, filename)[num], 'w') as file:
+                for entry in field_write:
+                    file.write(entry + "\n")
 
-    field2_write = parse_funct7_funct3(instructions_all, 2**field2_bits)
-    #field2_write = sort_entries(field2_write)
+# NAIVE configuration (based on R-type instructions):
+# Split instructions into 3 fields:
+# 1. Opcodes [6:0]
+# 2. funct7 + funct3 [31:25][14:2]
+# 3. rs2 rs1 rd [24:15][11:7]
+NAIVE_R_TYPE_TITLES = ["opcodes[6:0]", "funct7 + funct3 [31:25][14:2]", "rs2 rs1 rd [24:15][11:7]"]
+NAIVE_R_TYPE_KEY_WIDTHS = [3, 5, 8]
 
-    field3_write = parse_registers(instructions_all, 2**field3_bits)
-    #field3_write = sort_entries(field3_write)
+def profile_NAIVE_R_TYPE(profile, top=None, write_out=False, filename="NAIVE_R_TYPE"):
 
+    print("\nNAIVE_R_TYPE PROFILING\n")
 
-    if(write_out):
-        with open("profiling/field1_" + filename + ".mem", 'w') as file:
-            for entry in field1_write:
-                file.write(entry + "\n")
-        with open("profiling/field2_" + filename + ".mem", 'w') as file:
-            for entry in field2_write:
-                file.write(entry + "\n")
-        with open("profiling/field3_" + filename + ".mem", 'w') as file:
-            for entry in field3_write:
-                file.write(entry + "\n")
+    # Uncomment to print out all the instructions
+    #print_instr_w_type(dict(zip(to_bitstrings(profile.words, 32), profile.counts.tolist())))
+
+    profile_layout(profile, NAIVE_R_TYPE, NAIVE_R_TYPE_TITLES, NAIVE_R_TYPE_KEY_WIDTHS, top, write_out, filename)
 
 # Split instructions into 3 fields:
 # 1. Opcodes [6:0]
 # 2. imm[11:0] [31:20]
 # 3. rs1 funct3 rd [19:7]
-def profile_NAIVE_I_TYPE(instructions, instructions_all={}, write_out=False, filename="NAIVE_I_TYPE"):
+NAIVE_I_TYPE_TITLES = ["opcodes[6:0]", "imm[11:0] [31:20]", "rs1 funct3 rd [19:7]"]
+NAIVE_I_TYPE_KEY_WIDTHS = [3, 6, 7]
+
+def profile_NAIVE_I_TYPE(profile, top=None, write_out=False, filename="NAIVE_I_TYPE"):
     
     print("\nNAIVE_I_TYPE PROFILING\n")
 
     # Uncomment to print out all the instructions
-    #print_instr_w_type(instructions)
-
-    #####################
-    ###### OPCODES ######
-    #####################
-
-
-    # Parse the opcodes
-    field1 = get_opcodes(instructions)
-    field1 = sort_entries(field1)
-    field1_bits = print_stats(field1, "[FIELD 1] opcodes[6:0]", 0)
-
-    #######################
-    ######## IMM ##########
-    #######################
-    # Parse the registers
-    field2 = parse_imm_I_type(instructions)
-    field2 = sort_entries(field2)
-    field2_bits = print_stats(field2, "[FIELD 2] imm[11:0] [31:20]", 0)
-
-    #######################
-    ###### REGISTERS ######
-    #######################
-    # Parse the registers
-    field3 = parse_rs1_funct3_rd(instructions)
-    field3 = sort_entries(field3)
-    field3_bits = print_stats(field3, "[FIELD 3] rs1 funct3 rd [19:7]", 0)
-
-    print("===================================================")
-    print("[FIELD 1]:", field1_bits)
-    print("[FIELD 2]:", field2_bits)
-    print("[FIELD 3]:", field3_bits)
-    print("[FIELD 1] + [FIELD 2] + [FIELD 3]: ", field1_bits + field2_bits + field3_bits)
-    print("===================================================")
-
-    field1_bits = 3
-    field2_bits = 6
-    field3_bits = 7
+    #print_instr_w_type(dict(zip(to_bitstrings(profile.words, 32), profile.counts.tolist())))
 
-    # Get the max # compressible fields (from all instructions) to fill up luts
-    field1_write = get_opcodes(instructions_all, 2**field1_bits)
-    #field1_write = sort_entries(field1_write)
-
-    field2_write = parse_imm_I_type(instructions_all, 2**field2_bits)
-    #field2_write = sort_entries(field2_write)
-
-    field3_write = parse_rs1_funct3_rd(instructions_all, 2**field3_bits)
-    #field3_write = sort_entries(field3_write)
-
-
-    if(write_out):
-        with open("profiling/field1_" + filename + ".mem", 'w') as file:
-            for entry in field1_write:
-                file.write(entry + "\n")
-        with open("profiling/field2_" + filename + ".mem", 'w') as file:
-            for entry in field2_write:
-                file.write(entry + "\n")
-        with open("profiling/field3_" + filename + ".mem", 'w') as file:
-            for entry in field3_write:
-                file.write(entry + "\n")
+    profile_layout(profile, NAIVE_I_TYPE, NAIVE_I_TYPE_TITLES, NAIVE_I_TYPE_KEY_WIDTHS, top, write_out, filename)
 
 def main():
     # Parse trace
@@ -693,35 +444,42 @@ def main():
     # Remove prefix (everything before 'output/')
     prefix_removed = filename.split("output/")[-1]  # → "[program_name].out"
 
-    # Remove suffix ('.out')
-    program_name = prefix_removed.replace(".trace_dump", "")  # → "[program_name]"
+    # Remove suffix ('.trace_dump', or '.trace' for a raw simv trace)
+    program_name = prefix_removed.replace(".trace_dump", "").replace(".trace", "")  # → "[program_name]"
 
     print(program_name)
 
     instructions_all, num_instructions, max_pc = parse_assembly_file(filename)
-    get_instr_ratio(instructions_all)
+
+    # All the field histograms below (every layout, every cut-off) come from this one table
+    profile = FieldProfile(instructions_all)
+    # and every cut-off's coverage from this one curve
+    curve = CoverageCurve(profile.counts, num_instructions)
+    write_coverage_csv(curve, "profiling/coverage_" + program_name + ".csv")
+
+    print_instr_ratio(profile)
     #profile_various(instructions_all)
-    #profile_NAIVE_R_TYPE(instructions_all, instructions_all, True, "all")
-    profile_NAIVE_R_TYPE(instructions_all)
-    profile_NAIVE_I_TYPE(instructions_all)
+    #profile_NAIVE_R_TYPE(profile, None, True, "all")
+    profile_NAIVE_R_TYPE(profile)
+    profile_NAIVE_I_TYPE(profile)
 
-    instructions_128 = trim_instructions(instructions_all, num_instructions, 128)
-    get_instr_ratio(instructions_128)
+    print_coverage(curve, 128, num_instructions)
+    print_instr_ratio(profile, 128)
     #profile_various(instructions_128)
-    profile_NAIVE_R_TYPE(instructions_128)
-    profile_NAIVE_I_TYPE(instructions_128)
+    profile_NAIVE_R_TYPE(profile, 128)
+    profile_NAIVE_I_TYPE(profile, 128)
 
-    instructions_256 = trim_instructions(instructions_all, num_instructions, 256)
-    get_instr_ratio(instructions_256)
+    print_coverage(curve, 256, num_instructions)
+    print_instr_ratio(profile, 256)
     #profile_various(instructions_256)
-    profile_NAIVE_R_TYPE(instructions_256, instructions_all, True, "R_" + program_name)
-    profile_NAIVE_I_TYPE(instructions_256, instructions_all, True, "I_" + program_name)
+    profile_NAIVE_R_TYPE(profile, 256, True, "R_" + program_name)
+    profile_NAIVE_I_TYPE(profile, 256, True, "I_" + program_name)
 
-    instructions_512 = trim_instructions(instructions_all, num_instructions, 512)
-    get_instr_ratio(instructions_512)
+    print_coverage(curve, 512, num_instructions)
+    print_instr_ratio(profile, 512)
     #profile_various(instructions_512)
-    profile_NAIVE_R_TYPE(instructions_512)
-    profile_NAIVE_I_TYPE(instructions_512)
+    profile_NAIVE_R_TYPE(profile, 512)
+    profile_NAIVE_I_TYPE(profile, 512)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,9 @@
 import math
 from profilebitfields import *
+from tracecache import program_trace_file, load_trace, trace_sources
+from resultcache import memoize
+from memimage import MemImage
+from icachesim import fetch_addresses, simulate_controller, print_controller_stats
 
 
 # Check instruction for bitfield
@@ -9,28 +13,16 @@ def has_bitfield(end, start, instruction, bitfield):
         return True
     return False
 
-def parse_mem_NAIVE_R_TYPE(filename, max_pc):
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-
+# Parses the code of a memory image (addresses 0 to max_pc) into binary strings of each
+# instruction ("instr") and of each field of [layout] ("field1", "field2", ...)
+# Returns (mem, # lines up to max_pc, MemImage)
+def parse_mem_layout(filename, max_pc, layout):
+    image = MemImage(filename, max_pc)
     mem = {}
-    mem["instr"] = []
-    mem["field1"] = []
-    mem["field2"] = []
-    mem["field3"] = []
-    last_line = int(max_pc/4)
-    i = 0
-    for line in lines:
-        instr = bin(int(line, 16))[2:].zfill(32)
-        mem["instr"].append(instr)
-        mem["field1"].append(get_opcode(instr))
-        mem["field2"].append(get_funct7_funct3(instr))
-        mem["field3"].append(get_register(instr))
-        if i == last_line:
-            break
-        i += 1
-    
-    last_line += 1
+    mem["instr"] = image.bitstrings(WORD)
+    for num, ranges in enumerate(layout):
+        mem["field" + str(num + 1)] = image.bitstrings(ranges)
+    last_line = int(max_pc/4) + 1
     print("############################################")
     print("Parsed mem file")
     print("# instrs:")
@@ -39,38 +31,14 @@ def parse_mem_NAIVE_R_TYPE(filename, max_pc):
     print(last_line)
     print("############################################")
 
+    return mem, last_line, image
+
+def parse_mem_NAIVE_R_TYPE(filename, max_pc):
+    mem, last_line, image = parse_mem_layout(filename, max_pc, NAIVE_R_TYPE)
     return mem, last_line
 
 def parse_mem_NAIVE_I_TYPE(filename, max_pc):
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-
-    mem = {}
-    mem["instr"] = []
-    mem["field1"] = []
-    mem["field2"] = []
-    mem["field3"] = []
-    last_line = int(max_pc/4)
-    i = 0
-    for line in lines:
-        instr = bin(int(line, 16))[2:].zfill(32)
-        mem["instr"].append(instr)
-        mem["field1"].append(get_opcode(instr))
-        mem["field2"].append(parse_imm_I_type(instr))
-        mem["field3"].append(parse_rs1_funct3_rd(instr))
-        if i == last_line:
-            break
-        i += 1
-    
-    last_line += 1
-    print("############################################")
-    print("Parsed mem file")
-    print("# instrs:")
-    print(len(mem["instr"]))
-    print("last line:")
-    print(last_line)
-    print("############################################")
-
+    mem, last_line, image = parse_mem_layout(filename, max_pc, NAIVE_I_TYPE)
     return mem, last_line
 
 # [cache_size] in bytes
@@ -78,6 +46,7 @@ def parse_mem_NAIVE_I_TYPE(filename, max_pc):
 # [cache_blocks] number of instructions per cache line
 # [instr_size] size of each instruction in bits
 # [compressible] whether or not an instruction is compressible
+@memoize()
 def analyze_cache(cache_size, cache_ways, cache_blocks, instr_size, compressible, max_pc):
     print("############################################")
     print("Cache Size: ", cache_size, "B")
@@ -108,33 +77,23 @@ def analyze_cache(cache_size, cache_ways, cache_blocks, instr_size, compressible
     print("Set index bits: [", index_bit_end, "-", index_bit_start, "]")
     print("Tag bits: [", tag_bit_end, "-", tag_bit_start, "]")
 
-    cache = [[0] * cache_ways] * cache_lines 
-
     # find number of compressible cache lines
     # evaluate occupancy
-    num_compressible_instr = 0
-    num_compressible_cache_lines = 0
-    num_cache_lines = 0
-
-    set_counts = [0] * number_sets
-    num_matches_needed = cache_blocks
-    for address in range(0, max_pc + 4, 4*cache_blocks):
-        idx = int(address / 4)
-        num_matches = 0
-        num_cache_lines += 1
-        for val in range(0, cache_blocks):
-            if idx + val <= max_pc/4:
-                num_matches += compressible[idx + val]
-        num_compressible_instr += num_matches
-        if num_matches == num_matches_needed:
-            #print(str(1), " ", address, "-", address + 4*cache_blocks - 1)
-            num_compressible_cache_lines += 1
-            address_bin = bin(address)[2:].zfill(32)
-            index = get_bit_range(address_bin, index_bit_end, index_bit_start)
-            #print(int(index, 2))
-            set_counts[int(index, 2) - 1] += 1 #increase number of cache lines that map to this set
-        # else:
-        #     #print(str(0), " ", address, "-", address + 4*cache_blocks - 1)
+    # one row per cache line from address 0 up to max_pc, words past max_pc count as uncompressible
+    last_word = max_pc // 4
+    num_cache_lines = last_word // cache_blocks + 1
+    words = np.zeros(num_cache_lines * cache_blocks, dtype=np.int64)
+    in_range = np.asarray(compressible[:last_word + 1], dtype=np.int64)
+    words[:len(in_range)] = in_range
+    compressible_lines = words.reshape(num_cache_lines, cache_blocks).all(axis=1)
+
+    num_compressible_instr = int(words.sum())
+    num_compressible_cache_lines = int(compressible_lines.sum())
+
+    # number of compressible cache lines that map to each set
+    addresses = np.flatnonzero(compressible_lines) * (4 * cache_blocks)
+    index_mask = (1 << (index_bit_end - index_bit_start + 1)) - 1
+    set_counts = np.bincount((addresses >> index_bit_start) & index_mask, minlength=number_sets)
 
     print("num instructions: ", len(compressible))
     print("num compressible instr: ", num_compressible_instr)
@@ -142,139 +101,98 @@ def analyze_cache(cache_size, cache_ways, cache_blocks, instr_size, compressible
     print("num compressible cache lines: ", num_compressible_cache_lines)
     print("compressible lines/total lines", num_compressible_cache_lines/num_cache_lines)
     print("num compr. instructions in cache lines/num compressible instrs", (num_compressible_cache_lines * cache_blocks)/num_compressible_instr)
-    count = set_counts.count(0)
+    count = int((set_counts == 0).sum())
     print("# sets: ", len(set_counts))
     print("# sets that aren't used:", count)
     print("# sets that are used/#sets:", (len(set_counts) - count)/len(set_counts))
-    
-    for address in range(0, max_pc + 4, 4):
-        address_bin = bin(address)[2:].zfill(32)
-        tag = get_bit_range(address_bin, tag_bit_end, tag_bit_start)
-        index = get_bit_range(address_bin, index_bit_end, index_bit_start)
-        block_offset = get_bit_range(address_bin, block_offset_bit_end, block_offset_bit_start)
-        #print("addr: ", address_bin, "tag: ", tag, "index: ", index, "block_offset: ", block_offset)
 
     print("############################################")
 
-def analyze_num_occurences(top_instructions, mem, compressible, block_size):
+# Replays the fetch stream of a trace through both caches of controller.v (see icachesim.py)
+@memoize(inputs=lambda args: trace_sources(args["trace_file"]))
+def replay_controller(trace_file, compressible):
+    stats = simulate_controller(fetch_addresses(load_trace(trace_file)), compressible)
+    print_controller_stats(stats)
+    return stats
+
+# Index of the static instructions of a memory image: for every word, the rank of the executed
+# instruction it holds in [instructions] (sorted by execution count, as parse_assembly_file
+# returns them), or len(instructions) for words that never execute
+# Each distinct word is looked up once and its rank spread back to all of its positions.
+def instruction_ranks(words, instructions):
+    executed = np.fromiter((int(instr, 2) for instr in instructions), dtype=np.uint32, count=len(instructions))
+    unique, inverse = np.unique(np.asarray(words, dtype=np.uint32), return_inverse=True)
+    order = np.argsort(executed)
+    pos = np.minimum(np.searchsorted(executed[order], unique), max(len(executed) - 1, 0))
+    unique_ranks = np.full(len(unique), len(executed), dtype=np.int64)
+    if len(executed):
+        found = executed[order][pos] == unique
+        unique_ranks[found] = order[pos[found]]
+    return unique_ranks[inverse.ravel()]
+
+# For every block size in [block_sizes] and number of top instructions N in [tops]: how many
+# times the top N executed instructions appear in memory, and how many of those appearances are
+# in blocks (of block size words, from address 0) where every word is compressible
+# Both come from cumulative histograms of the ranks, so every (N, block size) pair is a lookup.
+# Returns {(N, block size): (# occurences, # occurences in compressible blocks)}
+def occurence_counts(ranks, compressible, tops, block_sizes):
+    num_ranks = int(ranks.max()) + 2 if len(ranks) else 1
+    compressible = np.asarray(compressible[:len(ranks)], dtype=bool)
+    occurences = np.concatenate(([0], np.cumsum(np.bincount(ranks, minlength=num_ranks))))
+    counts = {}
+    for block_size in block_sizes:
+        num_full = len(ranks) // block_size * block_size
+        in_block = np.zeros(len(ranks), dtype=bool)
+        in_block[:num_full] = np.repeat(compressible[:num_full].reshape(-1, block_size).all(axis=1), block_size)
+        in_compressible = np.concatenate(([0], np.cumsum(np.bincount(ranks[in_block], minlength=num_ranks))))
+        for top in tops:
+            cutoff = min(top, num_ranks)
+            counts[(top, block_size)] = (int(occurences[cutoff]), int(in_compressible[cutoff]))
+    return counts
+
+def print_num_occurences(num_top, block_size, num_occurences, num_compressible):
     print("############################################")
-    
-    # Count how many times out top [num] instruction appear in memory
-    unique_instrs = []
-    instr_count = {}
-    for instr in mem["instr"]: 
-        if instr in top_instructions:
-            if instr not in unique_instrs:
-                unique_instrs.append(instr)
-                instr_count[instr] = 0
-            instr_count[instr] += 1
     print("BLOCK SIZE: " + str(block_size))
-    print("Top " + str(len(top_instructions)) + " instructions memory occurences")
-    # for instr in instr_count:
-    #     print(instr + " | # in mem: " + str(instr_count[instr]) + " | # in mem/ # executed " + str(instr_count[instr] / top_instructions[instr]))
-    
-    # For our top [num] instructions, find out how many of them are in compressible cache lines
-    total_num_top_compressible_instructions = 0
-    for instr_base_idx in range(0, len(mem["instr"]), block_size):
-            num_compressible = 0
-            num_instructions_in_top = 0
-            for idx in range(instr_base_idx, instr_base_idx + block_size, 1):
-                if idx < len(mem["instr"]):
-                    if compressible[idx]:
-                        num_compressible += 1
-                    if mem["instr"][idx] in top_instructions:
-                        num_instructions_in_top += 1
-                    if(num_compressible == block_size):
-                        total_num_top_compressible_instructions += num_instructions_in_top
-
-    print("# occurences of top " + str(len(top_instructions)) + " instructions in mem: " + str(get_sum(instr_count)))
-    print("# occurences that are in compressible cache lines: " + str(total_num_top_compressible_instructions))
-    print("ratio: " + str(total_num_top_compressible_instructions / get_sum(instr_count)))
-            
+    print("Top " + str(num_top) + " instructions memory occurences")
+    print("# occurences of top " + str(num_top) + " instructions in mem: " + str(num_occurences))
+    print("# occurences that are in compressible cache lines: " + str(num_compressible))
+    print("ratio: " + str(num_compressible / num_occurences))
     print("############################################")
 
-    
-
 def main():
     # Parse trace
     program_name = sys.argv[1]
     mem_file     = sys.argv[2]
 
-    trace_dump_file = "output/" + program_name + ".trace_dump"
-    instructions_all, num_instructions, max_pc = parse_assembly_file(trace_dump_file)
+    trace_file = program_trace_file(program_name)
+    instructions_all, num_instructions, max_pc = parse_assembly_file(trace_file)
 
     #profiling_type = "R_"
     profiling_type = "I_"
-    field1_mem_filepath = "profiling/field1_" + profiling_type + program_name + ".mem"
-    field2_mem_filepath = "profiling/field2_" + profiling_type + program_name + ".mem"
-    field3_mem_filepath = "profiling/field3_" + profiling_type + program_name + ".mem"
+    layout = NAIVE_I_TYPE
 
-    field1 = {}
-    field2 = {}
-    field3 = {}
+    dictionaries = [read_dictionary("profiling/field" + str(num + 1) + "_" + profiling_type + program_name + ".mem")
+                    for num in range(len(layout))]
+    for ranges, dictionary in zip(layout, dictionaries):
+        print(dict.fromkeys(to_bitstrings(dictionary, field_width(ranges)), 0))
 
-    with open(field1_mem_filepath, 'r') as file:
-        lines = file.readlines()
-        for line in lines:
-            field1[line.strip()] = 0
-
-    with open(field2_mem_filepath, 'r') as file:
-        lines = file.readlines()
-        for line in lines:
-            field2[line.strip()] = 0
-
-    with open(field3_mem_filepath, 'r') as file:
-        lines = file.readlines()
-        for line in lines:
-            field3[line.strip()] = 0
+    # Parse mem file
+    mem_parsed, last_line, image = parse_mem_layout(mem_file, max_pc, layout)
 
-    print(field1)
-    print(field2)
-    print(field3)
+    # Look every field of every instruction up in its dictionary; an instruction is compressible
+    # when all of its fields are in there
+    hits, compressible_image = dictionary_hits(image.layout_fields(layout), [dictionaries])
+    compressible = np.zeros(last_line, dtype=np.int64)
+    compressible[:len(image)] = compressible_image[0]
 
-    # Parse mem file
-    mem_parsed, last_line = parse_mem_NAIVE_I_TYPE(mem_file, max_pc)
-
-    # Count how any bitfield matches each instruction has
-    num_fields = 3
-    line_matches = [0] * last_line
-    line_num = 0
-    for entry in mem_parsed["field1"]:
-        if entry in field1:
-            line_matches[line_num] += 1
-        line_num += 1
-    line_num = 0
-    for entry in mem_parsed["field2"]:
-        if entry in field2:
-            line_matches[line_num] += 1
-        line_num += 1
-    line_num = 0
-    for entry in mem_parsed["field3"]:
-        if entry in field3:
-            line_matches[line_num] += 1
-        line_num += 1
-    
-    # Determine whether a line is compressible based on the matches
-    compressible = []
-    for entry in line_matches:
-        if entry == 3:
-            compressible.append(1)
-        else:
-            compressible.append(0)
-
-    count = compressible.count(1)
+    count = int(compressible.sum())
     print("# compressible instructions:", count)  # Output: 5
 
-    # Print out everything for sanity's sake to check
-    line = 0
-    for instr in mem_parsed["instr"]:
-        num_matches = str(line_matches[line])
-        match = str(compressible[line])
-        field1 = get_opcode(instr)
-        field2 = get_funct7_funct3(instr)
-        field3 = get_register(instr)
-        line +=1
-        # print("NM: " + num_matches + " M?: " + match + " Instr: " + instr + " Opcode " + field1 + " f73: " + field2 + " reg: " + field3)
+    # Replay the fetch stream through both caches of controller.v with this compressibility
+    print("############################################")
+    print("Controller caches (see icachesim.py)")
+    replay_controller(trace_file, compressible)
+    print("############################################")
 
     # Analyze various cache configurations
 
@@ -329,26 +247,20 @@ def main():
     analyze_cache(256, 8, 4, 16, compressible, max_pc)
     analyze_cache(256, 8, 8, 16, compressible, max_pc)
 
-    instructions_128 = trim_instructions(instructions_all, num_instructions, 128)
-    instructions_256 = trim_instructions(instructions_all, num_instructions, 256)
-    instructions_512 = trim_instructions(instructions_all, num_instructions, 512)
+    curve = CoverageCurve(np.fromiter(instructions_all.values(), dtype=np.int64), num_instructions)
+    for num_instrs in (128, 256, 512):
+        print_coverage(curve, num_instrs, num_instructions)
 
     # Get info regarding how often our top instructions actually fit into cache lines
-
-    analyze_num_occurences(instructions_128, mem_parsed, compressible, 2)
-    analyze_num_occurences(instructions_128, mem_parsed, compressible, 4)
-    analyze_num_occurences(instructions_128, mem_parsed, compressible, 8)
-    analyze_num_occurences(instructions_256, mem_parsed, compressible, 2)
-    analyze_num_occurences(instructions_256, mem_parsed, compressible, 4)
-    analyze_num_occurences(instructions_256, mem_parsed, compressible, 8)
-    analyze_num_occurences(instructions_512, mem_parsed, compressible, 2)
-    analyze_num_occurences(instructions_512, mem_parsed, compressible, 4)
-    analyze_num_occurences(instructions_512, mem_parsed, compressible, 8)
-    
-    
-
+    tops = (128, 256, 512)
+    block_sizes = (2, 4, 8)
+    ranks = instruction_ranks(image.code, instructions_all)
+    counts = occurence_counts(ranks, compressible, [min(top, len(instructions_all)) for top in tops], block_sizes)
+    for top in tops:
+        num_top = min(top, len(instructions_all))
+        for block_size in block_sizes:
+            print_num_occurences(num_top, block_size, *counts[(num_top, block_size)])
 
 
 if __name__ == "__main__":
     main()
-
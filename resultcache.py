@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import pickle
+import hashlib
+import inspect
+import functools
+import numpy as np
+from dumpindex import file_hash
+
+# On disk memoization of the profiling stages (parse_assembly_file, profile_layout, analyze_cache,
+# the controller replay, ...)
+# A stage's result is stored under a hash of its code (its module and the project modules it
+# calls into, see CODE_MODULES), the contents of its input files (traces, disassemblies, memory
+# images) and its other arguments (arrays hashed by value), so re-running a profiler on an
+# unchanged program returns straight from disk and changing one parameter only recomputes the
+# stages that see it. Whatever the stage prints and the files it writes are stored with the
+# result and replayed on a hit, so the output is the same either way.
+# Entries live in RESULT_CACHE_DIR as <hash>.pkl; a hit touches the entry's mtime and once the
+# directory grows past RESULT_CACHE_SIZE MB the least recently used entries are evicted.
+# RESULT_CACHE_SIZE=0 turns the cache off.
+
+RESULT_CACHE_VERSION = 1
+
+CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join("profiling", ".cache"))
+CACHE_SIZE = int(float(os.environ.get("RESULT_CACHE_SIZE", 512)) * (1 << 20))
+
+# Content hashes of input files, keyed on their size and mtime so unchanged files aren't re-read
+FILE_INDEX = "files.json"
+
+# Project modules the stages call into: their source is part of every key along with the
+# stage's own module, so editing a callee (the icache model, the trace decoder, ...) doesn't
+# replay results of the old code
+CODE_MODULES = ("instrfields", "tracecache", "tracedecode", "dumpindex", "icachesim", "memimage",
+                "npzcache", "resultcache")
+
+def cache_enabled():
+    return CACHE_SIZE > 0
+
+def entry_path(key):
+    return os.path.join(CACHE_DIR, key + ".pkl")
+
+def load_file_index():
+    try:
+        with open(os.path.join(CACHE_DIR, FILE_INDEX), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_file_index(index):
+    path = os.path.join(CACHE_DIR, FILE_INDEX)
+    tmp_path = path + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(tmp_path, 'w') as file:
+            json.dump(index, file)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+# Hex sha1 of the contents of [filename]
+def content_hash(filename):
+    stat = os.stat(filename)
+    path = os.path.abspath(filename)
+    index = load_file_index()
+    entry = index.get(path)
+    if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+        return entry[2]
+    digest = file_hash(filename).tobytes().hex()
+    index[path] = [stat.st_size, stat.st_mtime_ns, digest]
+    save_file_index(index)
+    return digest
+
+# Feeds [value] into [digest]: arrays and lists of numbers by value, containers element by
+# element, objects with a cache_key() through it, anything else through its repr
+def update_digest(digest, value):
+    if hasattr(value, "cache_key"):
+        update_digest(digest, value.cache_key())
+    elif isinstance(value, np.ndarray):
+        digest.update(("array " + value.dtype.str + str(value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)) and value and all(isinstance(item, (int, float, bool, np.number)) for item in value):
+        update_digest(digest, np.asarray(value))
+    elif isinstance(value, (list, tuple)):
+        digest.update((type(value).__name__ + " " + str(len(value))).encode())
+        for item in value:
+            update_digest(digest, item)
+    elif isinstance(value, dict):
+        digest.update(("dict " + str(len(value))).encode())
+        for item in value.items():
+            update_digest(digest, item)
+    else:
+        digest.update((type(value).__name__ + " " + repr(value)).encode())
+
+# Copies everything written to stdout while a stage runs
+class Tee:
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+def load_entry(key):
+    path = entry_path(key)
+    try:
+        with open(path, 'rb') as file:
+            entry = pickle.load(file)
+        os.utime(path)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    return entry
+
+def store_entry(key, entry):
+    path = entry_path(key)
+    tmp_path = path + "." + str(os.getpid()) + ".tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError) as e:
+        print("Could not write result cache entry: " + str(e), file=sys.stderr)
+        return
+    evict(CACHE_SIZE)
+
+# Removes the least recently used entries until the cache holds at most [limit] bytes
+def evict(limit):
+    entries = []
+    try:
+        with os.scandir(CACHE_DIR) as scan:
+            for item in scan:
+                if item.name.endswith(".pkl"):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, item.path))
+    except OSError:
+        return
+    total = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+# Hex sha1 of the source of the module defining [func] and of CODE_MODULES
+def code_hash(func):
+    digest = hashlib.sha1(str(RESULT_CACHE_VERSION).encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+    filenames = [inspect.getsourcefile(func)] + [os.path.join(directory, name + ".py") for name in CODE_MODULES]
+    for filename in filenames:
+        digest.update(os.path.basename(filename).encode())
+        try:
+            with open(filename, 'rb') as file:
+                digest.update(file.read())
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+# Memoizes a stage on disk
+# [inputs] maps the stage's arguments ({name: value}) to the files it reads, whose contents are
+# hashed along with the arguments; [outputs] likewise to the files it writes, which are stored
+# with the result and written again on a hit.
+def memoize(inputs=None, outputs=None):
+    def decorator(func):
+        signature = inspect.signature(func)
+        func_hash = code_hash(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not cache_enabled():
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            input_files = inputs(arguments) if inputs is not None else []
+            output_files = outputs(arguments) if outputs is not None else []
+
+            digest = hashlib.sha1((func.__qualname__ + " " + func_hash).encode())
+            try:
+                for filename in input_files:
+                    digest.update(content_hash(filename).encode())
+            except OSError:
+                # missing input: let the stage report it
+                return func(*args, **kwargs)
+            for name, value in arguments.items():
+                digest.update(name.encode())
+                update_digest(digest, value)
+            key = digest.hexdigest()
+
+            entry = load_entry(key)
+            if entry is not None:
+                result, printed, files = entry
+                sys.stdout.write(printed)
+                for filename, contents in files.items():
+                    with open(filename, 'wb') as file:
+                        file.write(contents)
+                return result
+
+            stdout = sys.stdout
+            tee = Tee(stdout)
+            sys.stdout = tee
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                sys.stdout = stdout
+            files = {}
+            for filename in output_files:
+                with open(filename, 'rb') as file:
+                    files[filename] = file.read()
+            store_entry(key, (result, tee.getvalue(), files))
+            return result
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+# Number of entries and bytes in the cache
+def cache_usage():
+    entries = 0
+    total = 0
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".pkl"):
+                entries += 1
+                total += os.path.getsize(os.path.join(CACHE_DIR, name))
+    return entries, total
+
+# usage: python3 resultcache.py [clear | evict <MB>]
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "clear":
+        evict(0)
+    elif args and args[0] == "evict":
+        evict(int(float(args[1]) * (1 << 20)))
+    entries, total = cache_usage()
+    print(CACHE_DIR + ":", entries, "entries,", "%.1f MB" % (total / (1 << 20)), "of", "%.1f MB" % (CACHE_SIZE / (1 << 20)))
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,182 @@
+import os
 import sys
+import mmap
+import numpy as np
 
+# Compares two line based files (.mem images, .wb/.memacc/trace outputs, trace dumps) and reports
+# every region of differing lines, line i of one file against line i of the other.
+# Both files are memory mapped and compared a block of lines at a time: a block that is byte for
+# byte the same in both is skipped with one compare, and only blocks that differ are split into
+# lines. Line numbers of .mem program images are mapped back to the address of the line, of .mem
+# dictionaries to the dictionary entry, and lines of trace dumps to the PC they show.
+#
+# usage: python3 find_mem_diff.py <file1> <file2> [--max N]
+# --max caps the number of differing regions reported (default 100, 0 for all); the exit status
+# is 1 when the files differ
+
+LINES_PER_BLOCK = 1 << 14
+DEFAULT_MAX_DIFFS = 100
+CONTEXT_LINES = 3
+
+def map_file(path):
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+# End offset of the [num_lines] lines starting at [start] (or of the file), and the number of
+# lines in there
+def block_end(data, start, num_lines):
+    if start >= len(data):
+        return start, 0
+    window = max(num_lines * 16, 1 << 16)
+    while True:
+        end = min(start + window, len(data))
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8, count=end - start, offset=start) == ord("\n"))
+        if len(newlines) >= num_lines:
+            return start + int(newlines[num_lines - 1]) + 1, num_lines
+        if end == len(data):
+            # the last line may not end in a newline
+            unterminated = len(newlines) == 0 or start + int(newlines[-1]) + 1 < end
+            return end, len(newlines) + unterminated
+        window *= 2
+
+def split_lines(data, start, end):
+    lines = bytes(data[start:end]).split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    return lines
+
+# Yields (first line, last line, first lines of file 1, first lines of file 2) for every run of
+# differing lines (line numbers from 0, up to [context] lines of each file; past the end of the
+# shorter file its lines are None)
+def find_differences(data1, data2, lines_per_block=LINES_PER_BLOCK, context=CONTEXT_LINES):
+    pos1 = pos2 = 0
+    line = 0
+    region = None
+    while pos1 < len(data1) or pos2 < len(data2):
+        end1, count1 = block_end(data1, pos1, lines_per_block)
+        end2, count2 = block_end(data2, pos2, lines_per_block)
+        if count1 == count2 and data1[pos1:end1] == data2[pos2:end2]:
+            if region is not None:
+                yield tuple(region)
+                region = None
+        else:
+            lines1 = split_lines(data1, pos1, end1)
+            lines2 = split_lines(data2, pos2, end2)
+            for num in range(max(len(lines1), len(lines2))):
+                line1 = lines1[num] if num < len(lines1) else None
+                line2 = lines2[num] if num < len(lines2) else None
+                if line1 == line2:
+                    if region is not None:
+                        yield tuple(region)
+                        region = None
+                    continue
+                if region is None:
+                    region = [line + num, line + num, [], []]
+                region[1] = line + num
+                if len(region[2]) < context:
+                    region[2].append(line1)
+                    region[3].append(line2)
+        pos1, pos2 = end1, end2
+        line += max(count1, count2)
+    if region is not None:
+        yield tuple(region)
+
+# Returns the first differing line as (line number from 1, line of file 1, line of file 2),
+# or None if the files are identical
 def find_first_difference(file1_path, file2_path):
-    """Find the first line where two files differ."""
-    with open(file1_path, 'r') as file1, open(file2_path, 'r') as file2:
-        line_number = 0
-        for line1, line2 in zip(file1, file2):
-            line_number += 1
-            if line1 != line2:
-                return line_number, line1.strip(), line2.strip()
-        
-        # Check if one file has more lines than the other
-        remaining_file1 = file1.readline()
-        remaining_file2 = file2.readline()
-        
-        if remaining_file1 or remaining_file2:
-            line_number += 1
-            return line_number, remaining_file1.strip() if remaining_file1 else "<EOF>", remaining_file2.strip() if remaining_file2 else "<EOF>"
-        
-        return None  # Files are identical
+    for first, last, lines1, lines2 in find_differences(map_file(file1_path), map_file(file2_path)):
+        return first + 1, show_line(lines1[0]), show_line(lines2[0])
+    return None
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python find_diff.py <file1> <file2>")
+def show_line(line):
+    return "<EOF>" if line is None else line.decode(errors="replace").strip()
+
+def is_mem_image(path):
+    return os.path.splitext(path)[1].startswith(".mem") and not path.endswith(".memacc")
+
+HEX_DIGITS = set(b"0123456789abcdefABCDEF")
+
+# Bytes of memory per line of a program image (8, 16 or 32 hex digits a line, as
+# memimage.parse_mem_image reads them), or None for other .mem files like the field dictionaries
+# (one binary string a line)
+def mem_line_bytes(data):
+    head = bytes(data[:1 << 16])
+    first = head.split(b"\n", 1)[0].strip()
+    if len(first) not in (8, 16, 32) or not set(first) <= HEX_DIGITS:
+        return None
+    # an 8, 16 or 32 bit field has dictionary lines of the same length
+    if set(head) <= set(b"01\r\n"):
+        return None
+    return len(first) // 2
+
+# PC shown on a trace dump line ("<memory> | <PC> | <instr> | <assembly>"), or None
+def trace_pc(line):
+    if line is None:
+        return None
+    parts = line.split(b"|")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[1].strip(), 16)
+    except ValueError:
+        return None
+
+# Where a region of differing lines starts: its address in a program image, its entry in a
+# dictionary, the PC of its first line in each file of a trace dump
+def describe_location(path, data, first, line1, line2):
+    if is_mem_image(path):
+        line_bytes = mem_line_bytes(data)
+        if line_bytes is None:
+            return "entry %d" % first
+        return "address 0x%08x" % (first * line_bytes)
+    pc1, pc2 = trace_pc(line1), trace_pc(line2)
+    if pc1 is None and pc2 is None:
+        return None
+    if pc1 == pc2:
+        return "PC 0x%08x" % pc1
+    return "PC " + " / ".join("-" if pc is None else "0x%08x" % pc for pc in (pc1, pc2))
+
+def print_region(num, region, file1_path, data1):
+    first, last, lines1, lines2 = region
+    location = describe_location(file1_path, data1, first, lines1[0], lines2[0])
+    print(f"Difference {num} at line {first + 1}" + (f"-{last + 1} ({last - first + 1} lines)" if last > first else "")
+          + (f", {location}" if location else ""))
+    for line1, line2 in zip(lines1, lines2):
+        print(f"  File 1: {show_line(line1)}")
+        print(f"  File 2: {show_line(line2)}")
+    if last - first + 1 > len(lines1):
+        print(f"  ... {last - first + 1 - len(lines1)} more lines")
+
+def main():
+    args = sys.argv[1:]
+    max_diffs = DEFAULT_MAX_DIFFS
+    if "--max" in args:
+        idx = args.index("--max")
+        max_diffs = int(args[idx + 1])
+        del args[idx:idx + 2]
+    if len(args) != 2:
+        print("Usage: python find_mem_diff.py <file1> <file2> [--max N]")
         sys.exit(1)
-    
-    file1_path = sys.argv[1]
-    file2_path = sys.argv[2]
-    
-    result = find_first_difference(file1_path, file2_path)
-    
-    if result:
-        line_num, line1, line2 = result
-        print(f"First difference at line {line_num}:")
-        print(f"File 1: {line1}")
-        print(f"File 2: {line2}")
+
+    file1_path = args[0]
+    file2_path = args[1]
+    data1 = map_file(file1_path)
+    data2 = map_file(file2_path)
+
+    num = 0
+    for region in find_differences(data1, data2):
+        num += 1
+        print_region(num, region, file1_path, data1)
+        if num == max_diffs:
+            print(f"Stopped after {max_diffs} differences")
+            break
+
+    if num == 0:
+        print("Files are identical.")
     else:
-        print("Files are identical.")
\ No newline at end of file
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,23 @@
 import os
 import re
+import sys
+import csv
+import json
+from multiprocessing import Pool
 from pathlib import Path
 
+# Collects the cache and cycle stats of the simulator logs in output/ (<prog>.out, .cont.out,
+# .base.out, .syn.out, .cont.syn.out)
+# The stats are printed at the very end of a log, after the per cycle output, so each log is read
+# backwards in blocks only until the stats block (which starts at the firmware's "Cycle counter"
+# line) turns up. Logs are read on a process pool, and the stats of every log are kept in a
+# manifest next to the logs, keyed on their size and mtime, so only new or changed logs are read
+# again. The stats of all variants of a program are written side by side as one row of a CSV
+# (or as {program: {variant: stats}} JSON).
+#
+# usage: python3 get_output_data.py [--dir output] [--exclude prog,prog,...|--all]
+#                                   [--out dataset.csv|.json] [--processes N]
+
 EXCLUDED_PROGRAMS = {
     "basic", 
     "hello",
@@ -22,71 +38,164 @@ EXCLUDED_PROGRAMS = {
     "qrduino"
 }
 
-def parse_output_files(directory="../output"):
-    results = {}
-    
-    # Regular expressions for all metrics
-    reg_miss_rate_re = re.compile(r"Icache Miss rate:\s+([\d.]+)")
-    reg_occupancy_re = re.compile(r"Icache occupancy:\s+(\d+)")
-    comp_miss_rate_re = re.compile(r"Compressed Icache Miss rate:\s+([\d.]+)")
-    comp_occupancy_re = re.compile(r"Compressed Icache Occupancy:\s+(\d+)")
-    cycles_re = re.compile(r"Cycle counter\s+\.+(\d+)")
-    imem_re = re.compile(r"Imem Accesses:\s+(\d+)")
-    combined_miss_re = re.compile(r"Combined cache Statistics:\s+Hits:\s+\d+,\s+Misses:\s+\d+\s+Miss rate:\s+([\d.]+)")
-
-    for file in os.listdir(directory):
-        if file.endswith(".out"):
-            program_name = os.path.splitext(file)[0]
-            
-            if program_name in EXCLUDED_PROGRAMS:
-                print(f"Skipping excluded program: {program_name}")
+VARIANTS = ["out", "cont.out", "base.out", "syn.out", "cont.syn.out"]
+
+METRICS = ["Reg Miss Rate", "Reg Occupancy", "Comp Miss Rate", "Comp Occupancy",
+           "Combined Miss Rate", "Cycles", "Imem Accesses"]
+
+MANIFEST_FILE = ".output_data.json"
+MANIFEST_VERSION = 1
+
+TAIL_BLOCK = 1 << 16
+# the stats block starts at the firmware's cycle counter, the per cycle output at BEGIN
+STATS_START = b"Cycle counter"
+LOG_START = b"============BEGIN"
+
+# Regular expressions for all metrics
+METRIC_RES = [
+    ('Reg Miss Rate', re.compile(r"Icache Miss rate:\s+([\d.]+)"), float),
+    ('Reg Occupancy', re.compile(r"Icache occupancy:\s+(\d+)"), int),
+    ('Comp Miss Rate', re.compile(r"Compressed Icache Miss rate:\s+([\d.]+)"), float),
+    ('Comp Occupancy', re.compile(r"Compressed Icache Occupancy:\s+(\d+)"), int),
+    ('Cycles', re.compile(r"Cycle counter\s+\.+(\d+)"), int),
+    ('Imem Accesses', re.compile(r"Imem Accesses:\s+(\d+)"), int),
+    ('Combined Miss Rate', re.compile(r"Combined cache Statistics:\s+Hits:\s+\d+,\s+Misses:\s+\d+\s+Miss rate:\s+([\d.]+)"), float),
+]
+
+def default_output_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "output")
+
+# Splits a log name into (program, variant): "edn.cont.out" -> ("edn", "cont.out")
+def split_log_name(file):
+    program_name, _, variant = file.partition(".")
+    return program_name, variant
+
+# Returns the end of a log from its stats block on (the whole log after BEGIN when there's none)
+def read_stats_block(filepath):
+    blocks = []
+    overlap = max(len(STATS_START), len(LOG_START)) - 1
+    with open(filepath, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - TAIL_BLOCK)
+            f.seek(start)
+            block = f.read(end - start)
+            end = start
+            # a marker can straddle this block and the one after it
+            window = block + (blocks[-1][:overlap] if blocks else b"")
+            blocks.append(block)
+            idx = window.rfind(STATS_START)
+            if idx >= 0:
+                return b"".join(reversed(blocks))[idx:].decode(errors="replace")
+            if LOG_START in window:
+                break
+    return b"".join(reversed(blocks)).decode(errors="replace")
+
+def parse_metrics(content):
+    metrics = {}
+    for name, regex, convert in METRIC_RES:
+        match = regex.search(content)
+        if match:
+            metrics[name] = convert(match.group(1))
+    return metrics
+
+# Parses one log; returns (file, metrics) or (file, error message)
+def parse_output_file(filepath):
+    try:
+        return filepath, parse_metrics(read_stats_block(filepath))
+    except Exception as e:
+        return filepath, f"{e}"
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("logs", {})
+
+def save_manifest(directory, logs):
+    path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        with open(path + ".tmp", 'w') as f:
+            json.dump({"version": MANIFEST_VERSION, "logs": logs}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Could not write manifest {path}: {e}")
+
+# Returns {log name without .out: metrics} (e.g. "edn", "edn.cont") for every log in [directory]
+# whose program isn't in [excluded], reading only logs not in the manifest or changed since
+def parse_output_files(directory=None, excluded=EXCLUDED_PROGRAMS, processes=None):
+    if directory is None:
+        directory = default_output_dir()
+    manifest = load_manifest(directory)
+    files = sorted(file for file in os.listdir(directory) if file.endswith(".out"))
+    logs = {}
+    stale = []
+
+    for file in files:
+        program_name, variant = split_log_name(file)
+
+        if program_name in excluded:
+            print(f"Skipping excluded program: {file}")
+            continue
+
+        stat = os.stat(os.path.join(directory, file))
+        entry = manifest.get(file)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            logs[file] = entry
+        else:
+            logs[file] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "metrics": {}}
+            stale.append(os.path.join(directory, file))
+
+    if stale:
+        print(f"Parsing {len(stale)} of {len(logs)} logs")
+        if len(stale) > 1 and processes != 1:
+            with Pool(processes) as pool:
+                parsed = list(pool.imap_unordered(parse_output_file, stale))
+        else:
+            parsed = [parse_output_file(filepath) for filepath in stale]
+        for filepath, metrics in parsed:
+            if isinstance(metrics, str):
+                print(f"Error processing {filepath}: {metrics}")
+                del logs[os.path.basename(filepath)]
                 continue
-            
-            filepath = os.path.join(directory, file)
-            
-            try:
-                with open(filepath, 'r') as f:
-                    content = f.read()
-                
-                # Extract all metrics
-                metrics = {}
-                
-                # Regular Icache stats
-                reg_miss_match = reg_miss_rate_re.search(content)
-                reg_occ_match = reg_occupancy_re.search(content)
-                
-                # Compressed Icache stats
-                comp_miss_match = comp_miss_rate_re.search(content)
-                comp_occ_match = comp_occupancy_re.search(content)
-                
-                # Other metrics
-                cycle_match = cycles_re.search(content)
-                imem_match = imem_re.search(content)
-                combined_miss_match = combined_miss_re.search(content)
-                
-                if reg_miss_match:
-                    metrics['Reg Miss Rate'] = float(reg_miss_match.group(1))
-                if reg_occ_match:
-                    metrics['Reg Occupancy'] = int(reg_occ_match.group(1))
-                if comp_miss_match:
-                    metrics['Comp Miss Rate'] = float(comp_miss_match.group(1))
-                if comp_occ_match:
-                    metrics['Comp Occupancy'] = int(comp_occ_match.group(1))
-                if cycle_match:
-                    metrics['Cycles'] = int(cycle_match.group(1))
-                if imem_match:
-                    metrics['Imem Accesses'] = int(imem_match.group(1))
-                if combined_miss_match:
-                    metrics['Combined Miss Rate'] = float(combined_miss_match.group(1))
-                
-                if metrics:
-                    results[program_name] = metrics
-                    
-            except Exception as e:
-                print(f"Error processing {filepath}: {e}")
-    
+            logs[os.path.basename(filepath)]["metrics"] = metrics
+        # excluded logs keep their entries; logs that are gone lose them
+        save_manifest(directory, {file: entry for file, entry in {**manifest, **logs}.items() if file in files})
+
+    results = {}
+    for file, entry in logs.items():
+        if entry["metrics"]:
+            results[file[:-len(".out")]] = entry["metrics"]
     return results
 
+# {program: {variant: metrics}} from the results of parse_output_files
+def group_by_program(results):
+    programs = {}
+    for name, metrics in sorted(results.items()):
+        program_name, variant = split_log_name(name + ".out")
+        programs.setdefault(program_name, {})[variant] = metrics
+    return programs
+
+# Writes one row per program with the metrics of each of its variants side by side (.csv),
+# or the grouped results as JSON (.json)
+def write_dataset(results, filename):
+    programs = group_by_program(results)
+    with open(filename, 'w', newline='') as f:
+        if filename.endswith(".json"):
+            json.dump(programs, f, indent=2)
+            return
+        variants = [variant for variant in VARIANTS if any(variant in logs for logs in programs.values())]
+        variants += sorted(set(variant for logs in programs.values() for variant in logs) - set(variants))
+        writer = csv.writer(f)
+        writer.writerow(["Program"] + [f"{variant} {metric}" for variant in variants for metric in METRICS])
+        for program_name, logs in programs.items():
+            writer.writerow([program_name] + [logs.get(variant, {}).get(metric, "")
+                                              for variant in variants for metric in METRICS])
+
 def print_results(results):
     if not results:
         print("No results found!")
@@ -153,10 +262,34 @@ def print_results(results):
     #           f"{avg_imem if isinstance(avg_imem, str) else avg_imem:<10.1f}")
 
 
+def parse_args(args):
+    options = {"dir": None, "exclude": EXCLUDED_PROGRAMS, "out": None, "processes": None}
+    while args:
+        arg = args.pop(0)
+        if arg == "--all":
+            options["exclude"] = set()
+        elif arg in ("--dir", "--exclude", "--out", "--processes") and args:
+            value = args.pop(0)
+            if arg == "--exclude":
+                options["exclude"] = set(name for name in value.split(",") if name)
+            elif arg == "--processes":
+                options["processes"] = int(value)
+            else:
+                options[arg[2:]] = value
+        else:
+            print("usage: python3 get_output_data.py [--dir output] [--exclude prog,prog,...|--all] "
+                  "[--out dataset.csv|.json] [--processes N]")
+            sys.exit(1)
+    return options
+
 def main():
-    results = parse_output_files()
+    options = parse_args(sys.argv[1:])
+    results = parse_output_files(options["dir"], options["exclude"], options["processes"])
     print("\nCache Performance Metrics:")
     print_results(results)
+    if options["out"] is not None:
+        write_dataset(results, options["out"])
+        print(f"\nWrote {options['out']}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import sqlite3
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from get_output_data import parse_output_files, default_output_dir, EXCLUDED_PROGRAMS
+
+# Local results store: every collection of simulator logs (see get_output_data.py) or of sweep
+# results (see sweep.py) is saved as a run, tagged with a configuration name, its parameters and
+# the git revision it was built from, in an SQLite database (profiling/results.db by default).
+# Runs can then be compared against each other across the whole suite, or against the previous
+# run of the same tag to find the programs that regressed.
+#
+# usage: python3 results_db.py [--db results.db] <command> ... (commands in USAGE below)
+# regressions exits with 1 if any program regressed, so it can gate a script.
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "profiling", "results.db")
+
+# metrics where a larger value is worse
+LOWER_IS_BETTER = {"Cycles", "Imem Accesses", "Reg Miss Rate", "Comp Miss Rate", "Combined Miss Rate",
+                   "accesses", "icache_miss_rate", "comp_miss_rate", "combined_miss_rate", "imem_accesses"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tag TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    params TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    program TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, metric, variant, program)
+);
+CREATE INDEX IF NOT EXISTS runs_tag ON runs (tag, id);
+CREATE INDEX IF NOT EXISTS results_program ON results (metric, variant, program, run_id);
+"""
+
+def connect(filename=DEFAULT_DB):
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(filename)
+    db.execute("PRAGMA foreign_keys = ON")
+    db.executescript(SCHEMA)
+    return db
+
+# Current git revision of the repository, with "-dirty" if it has local changes
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty", "--abbrev=12"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+# Stores one run; [results] is {(program, variant): {metric: value}}
+def add_run(db, tag, params, source, results, revision=None):
+    with db:
+        cursor = db.execute("INSERT INTO runs (tag, revision, params, source, created) VALUES (?, ?, ?, ?, ?)",
+                            (tag, revision if revision is not None else git_revision(),
+                             json.dumps(params, sort_keys=True), source, datetime.now().isoformat(timespec="seconds")))
+        run_id = cursor.lastrowid
+        db.executemany("INSERT INTO results (run_id, program, variant, metric, value) VALUES (?, ?, ?, ?, ?)",
+                       [(run_id, program, variant, metric, float(value))
+                        for (program, variant), metrics in results.items()
+                        for metric, value in metrics.items()])
+    return run_id
+
+# Ingests the stats of every simulator log in [directory] as one run
+def ingest_logs(db, tag, directory=None, params=None, excluded=EXCLUDED_PROGRAMS):
+    results = {}
+    for name, metrics in parse_output_files(directory, excluded).items():
+        program_name, _, variant = (name + ".out").partition(".")
+        results[(program_name, variant)] = metrics
+    return add_run(db, tag, params or {}, directory or default_output_dir(), results)
+
+# Ingests a sweep results file: one run per configuration (tagged [prefix] plus its parameters),
+# with a row for every program swept with it
+def ingest_sweep(db, filename, prefix="sweep"):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from sweep import read_results, CONFIG_COLUMNS, RESULT_COLUMNS
+
+    configs = {}
+    for row in read_results(filename):
+        params = {column: row[column] for column in CONFIG_COLUMNS if column != "program"}
+        key = json.dumps(params, sort_keys=True)
+        configs.setdefault(key, (params, {}))[1][(row["program"], "sweep")] = \
+            {column: row[column] for column in RESULT_COLUMNS if row.get(column, "") != ""}
+    run_ids = []
+    revision = git_revision()
+    for params, results in configs.values():
+        tag = prefix + ":" + ",".join(str(params[column]) for column in CONFIG_COLUMNS if column != "program")
+        run_ids.append(add_run(db, tag, params, filename, results, revision))
+    return run_ids
+
+# A run given by id, or the latest run of a tag
+def resolve_run(db, run):
+    if str(run).isdigit():
+        row = db.execute("SELECT id FROM runs WHERE id = ?", (int(run),)).fetchone()
+    else:
+        row = db.execute("SELECT id FROM runs WHERE tag = ? ORDER BY id DESC LIMIT 1", (run,)).fetchone()
+    if row is None:
+        raise KeyError("no run " + str(run))
+    return row[0]
+
+def list_runs(db, tag=None):
+    query = ("SELECT runs.id, tag, revision, created, COUNT(DISTINCT program) FROM runs "
+             "LEFT JOIN results ON results.run_id = runs.id ")
+    args = ()
+    if tag is not None:
+        query += "WHERE tag = ? "
+        args = (tag,)
+    return db.execute(query + "GROUP BY runs.id ORDER BY runs.id", args).fetchall()
+
+# [(program, variant, value in A, value in B)] for every program and variant of both runs
+def compare_runs(db, run_a, run_b, metric="Cycles", variant=None):
+    query = ("SELECT a.program, a.variant, a.value, b.value FROM results a "
+             "JOIN results b ON b.run_id = ? AND b.metric = a.metric AND b.variant = a.variant AND b.program = a.program "
+             "WHERE a.run_id = ? AND a.metric = ?")
+    args = [run_b, run_a, metric]
+    if variant is not None:
+        query += " AND a.variant = ?"
+        args.append(variant)
+    return db.execute(query + " ORDER BY a.program, a.variant", args).fetchall()
+
+# Latest run of [tag] (of any tag without one) and the run of the same tag before it
+def latest_runs(db, tag=None):
+    if tag is None:
+        row = db.execute("SELECT tag FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            return None, None
+        tag = row[0]
+    rows = db.execute("SELECT id FROM runs WHERE tag = ? ORDER BY id DESC LIMIT 2", (tag,)).fetchall()
+    if len(rows) < 2:
+        return None, rows[0][0] if rows else None
+    return rows[1][0], rows[0][0]
+
+# Programs whose [metric] got worse by more than [threshold] (relative) from the previous run of
+# [tag] to the latest one: [(program, variant, before, after)]
+def regressions(db, tag=None, metric="Cycles", variant=None, threshold=0.0):
+    before, after = latest_runs(db, tag)
+    if before is None:
+        return before, after, []
+    sign = 1 if metric in LOWER_IS_BETTER else -1
+    regressed = [(program, variant_name, old, new) for program, variant_name, old, new
+                 in compare_runs(db, before, after, metric, variant)
+                 if sign * (new - old) > threshold * abs(old)]
+    return before, after, regressed
+
+def relative_change(old, new):
+    return (new - old) / old if old else float("inf") if new else 0.0
+
+def print_comparison(rows, title_a, title_b):
+    if not rows:
+        print("No common results!")
+        return
+    width = max(max(len(program + "." + variant) for program, variant, a, b in rows), len("Program"))
+    print(f"{'Program':<{width}}  {title_a:>14}  {title_b:>14}  {'Change':>8}")
+    print("-" * (width + 44))
+    for program, variant, a, b in rows:
+        print(f"{program + '.' + variant:<{width}}  {a:>14g}  {b:>14g}  {relative_change(a, b):>+8.2%}")
+
+def print_runs(runs):
+    print(f"{'Run':<5} {'Tag':<30} {'Revision':<20} {'Created':<20} Programs")
+    for run_id, tag, revision, created, programs in runs:
+        print(f"{run_id:<5} {tag:<30} {revision:<20} {created:<20} {programs}")
+
+USAGE = """usage: python3 results_db.py [--db results.db] <command> ...
+  ingest-logs --tag <name> [--dir output] [--param key=value ...] [--all]
+  ingest-sweep <results.csv|.json> [--tag <prefix>]
+  runs [--tag <name>]
+  compare <tag or run id A> <tag or run id B> [--metric Cycles] [--variant cont.out]
+  regressions [--tag <name>] [--metric Cycles] [--variant cont.out] [--threshold 0.01]"""
+
+# Splits arguments into positionals and {option: [values]}; --all takes no value
+def parse_args(args):
+    positional = []
+    options = {}
+    while args:
+        arg = args.pop(0)
+        if arg == "--all":
+            options["all"] = [True]
+        elif arg.startswith("--") and args:
+            options.setdefault(arg[2:], []).append(args.pop(0))
+        elif arg.startswith("--"):
+            print(USAGE)
+            sys.exit(1)
+        else:
+            positional.append(arg)
+    return positional, options
+
+def option(options, name, default=None):
+    return options[name][-1] if name in options else default
+
+def main():
+    positional, options = parse_args(sys.argv[1:])
+    if not positional:
+        print(USAGE)
+        sys.exit(1)
+    command = positional[0]
+    db = connect(option(options, "db", DEFAULT_DB))
+
+    if command == "ingest-logs" and "tag" in options:
+        params = dict(param.split("=", 1) for param in options.get("param", []))
+        excluded = set() if "all" in options else EXCLUDED_PROGRAMS
+        run_id = ingest_logs(db, option(options, "tag"), option(options, "dir"), params, excluded)
+        print(f"Stored run {run_id}")
+    elif command == "ingest-sweep" and len(positional) == 2:
+        run_ids = ingest_sweep(db, positional[1], option(options, "tag", "sweep"))
+        print(f"Stored {len(run_ids)} runs")
+    elif command == "runs":
+        print_runs(list_runs(db, option(options, "tag")))
+    elif command == "compare" and len(positional) == 3:
+        run_a, run_b = resolve_run(db, positional[1]), resolve_run(db, positional[2])
+        metric = option(options, "metric", "Cycles")
+        print(f"{metric}: run {run_a} ({positional[1]}) vs run {run_b} ({positional[2]})")
+        print_comparison(compare_runs(db, run_a, run_b, metric, option(options, "variant")),
+                         "A", "B")
+    elif command == "regressions":
+        metric = option(options, "metric", "Cycles")
+        before, after, regressed = regressions(db, option(options, "tag"), metric, option(options, "variant"),
+                                               float(option(options, "threshold", 0.0)))
+        if before is None:
+            print("Need two runs of the same tag to look for regressions")
+            return
+        print(f"{metric}: run {before} -> run {after}, {len(regressed)} regressed")
+        if regressed:
+            print_comparison(regressed, "Before", "After")
+            sys.exit(1)
+    else:
+        print(USAGE)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,99 @@
 #!/usr/bin/env python3
 # Adapted from picorv32
 
-import sys, re, subprocess
+import os, sys
 
-trace_filename = sys.argv[1]
-dump_filename = sys.argv[2]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dumpindex import load_insns
 
-insns = dict()
+# usage: showtrace.py [--fast] <trace> <dump_abi>
+# --fast decodes the trace in blocks with NumPy and writes the (identical) output in bulk
+fast = "--fast" in sys.argv[1:]
+args = [arg for arg in sys.argv[1:] if arg != "--fast"]
+trace_filename = args[0]
+dump_filename = args[1]
 
-with open(dump_filename, "r") as f:
-    while True:
-        line = f.readline()
-        if line == '': break
-        match = re.match(r'^\s*([0-9a-f]+):\s+([0-9a-f]+)\s*(.*)', line)
-        if match: insns[int(match.group(1), 16)] = (int(match.group(2), 16), match.group(3).replace("\t", " "))
+BRANCH_OPS = ["j", "jal", "jr", "jalr", "ret", "retirq",
+        "beq", "bne", "blt", "ble", "bge", "bgt", "bltu", "bleu", "bgeu", "bgtu",
+        "beqz", "bnez", "blez", "bgez", "bltz", "bgtz"]
+ADDR_OPS = ["lb", "lh", "lw", "lbu", "lhu", "sb", "sh", "sw"]
+HEADER = "MEMACCES/REGWRITE   | PC | 0xINSTR  | Instruction"
+
+# Same output as the line by line loop below, built from a per PC table of formatted lines
+def show_trace_fast(trace_filename, insns, out):
+    import numpy as np
+    from tracedecode import read_trace_blocks, split_trace_words, format_payloads
+
+    # pc -> (rest of the line, pc step, branch data expected, addr data expected)
+    table = dict()
+    for pc, (insn_opcode, insn_desc) in insns.items():
+        # data words of the -D disassembly can come without a mnemonic
+        parts = insn_desc.split()
+        opname = parts[0] if parts else ""
+        if insn_opcode == 0x0400000b:
+            insn_desc = "retirq"
+            opname = "retirq"
+        opcode_fmt = "%08x" if (insn_opcode & 3) == 3 else "    %04x"
+        line = (" | %08x | " + opcode_fmt + " | %s\n") % (pc, insn_opcode, insn_desc)
+        table[pc] = (line.encode(), 4 if (insn_opcode & 3) == 3 else 2,
+                opname in BRANCH_OPS, opname in ADDR_OPS)
+
+    pc = -1
+    last_irq = False
+    for words in read_trace_blocks(trace_filename):
+        payloads, irqs, addrs, branches = split_trace_words(words)
+        prev_irqs = np.concatenate(([last_irq], irqs[:-1]))
+        irq_starts = irqs & ~prev_irqs
+
+        infos = np.empty((len(words), 13), dtype=np.uint8)
+        infos[:, 0:3] = np.where((irqs | prev_irqs)[:, None],
+                np.frombuffer(b"IRQ", dtype=np.uint8), np.frombuffer(b"   ", dtype=np.uint8))
+        infos[:, 3] = ord(" ")
+        infos[:, 4] = np.where(branches, ord(">"), np.where(addrs, ord("@"), ord("=")))
+        infos[:, 5:] = format_payloads(payloads)
+
+        lines = []
+        for info, payload, irq_start, is_addr, is_branch in zip(infos.view("S13").ravel().tolist(),
+                payloads.tolist(), irq_starts.tolist(), addrs.tolist(), branches.tolist()):
+            if irq_start:
+                pc = 0x10
+
+            if pc >= 0:
+                entry = table.get(pc)
+                if entry is not None:
+                    line, step, branch_ok, addr_ok = entry
+                    if is_branch and not branch_ok:
+                        lines.append(b"%s ** UNEXPECTED BRANCH DATA FOR INSN AT %08x! **\n" % (info, pc))
+                    if is_addr and not addr_ok:
+                        lines.append(b"%s ** UNEXPECTED ADDR DATA FOR INSN AT %08x! **\n" % (info, pc))
+                    lines.append(info + line)
+                    if not is_addr:
+                        pc += step
+                else:
+                    lines.append(b"%s ** NO INFORMATION ON INSN AT %08x! **\n" % (info, pc))
+                    pc = -1
+            else:
+                if is_branch:
+                    lines.append(b"%s ** FOUND BRANCH AND STARTING DECODING **\n" % info)
+                    lines.append(HEADER.encode() + b"\n")
+                else:
+                    lines.append(b"%s ** SKIPPING DATA UNTIL NEXT BRANCH **\n" % info)
+
+            if is_branch:
+                pc = payload
+
+        out.write(b"".join(lines))
+        if len(words):
+            last_irq = bool(irqs[-1])
+
+# pc -> (opcode, text), from the disassembly index next to the dump (see dumpindex.py)
+insns = load_insns(dump_filename)
+
+if fast:
+    sys.stdout.flush()
+    show_trace_fast(trace_filename, insns, sys.stdout.buffer)
+    sys.stdout.buffer.flush()
+    sys.exit(0)
 
 with open(trace_filename, "r") as f:
     pc = -1
@@ -39,12 +119,10 @@ with open(trace_filename, "r") as f:
                     insn_desc = "retirq"
                     opname = "retirq"
 
-                if is_branch and opname not in ["j", "jal", "jr", "jalr", "ret", "retirq",
-                        "beq", "bne", "blt", "ble", "bge", "bgt", "bltu", "bleu", "bgeu", "bgtu",
-                        "beqz", "bnez", "blez", "bgez", "bltz", "bgtz"]:
+                if is_branch and opname not in BRANCH_OPS:
                     print("%s ** UNEXPECTED BRANCH DATA FOR INSN AT %08x! **" % (info, pc))
 
-                if is_addr and opname not in ["lb", "lh", "lw", "lbu", "lhu", "sb", "sh", "sw"]:
+                if is_addr and opname not in ADDR_OPS:
                     print("%s ** UNEXPECTED ADDR DATA FOR INSN AT %08x! **" % (info, pc))
 
                 opcode_fmt = "%08x" if (insn_opcode & 3) == 3 else "    %04x"
@@ -57,7 +135,7 @@ with open(trace_filename, "r") as f:
         else:
             if is_branch:
                 print("%s ** FOUND BRANCH AND STARTING DECODING **" % info)
-                print("MEMACCES/REGWRITE   | PC | 0xINSTR  | Instruction")
+                print(HEADER)
             else:
                 print("%s ** SKIPPING DATA UNTIL NEXT BRANCH **" % info)
 
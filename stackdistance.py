@@ -0,0 +1,137 @@
+import sys
+import numpy as np
+from tracecache import load_trace
+from instrfields import NAIVE_R_TYPE, NAIVE_I_TYPE, read_dictionary, dictionary_hits
+from memimage import MemImage
+from icachesim import clog2, run_starts, line_addresses, fetch_addresses, compressible_lines, NUM_BLOCKS, BLOCK_SIZE, BLOCK_SIZE_COMP
+
+# Miss ratio curves of the fetch stream for every cache capacity at once (Mattson stack distances)
+# With LRU replacement a fetch hits in a cache of W ways per set iff fewer than W other lines of
+# its set were used since the last fetch of its line (its stack distance). One histogram of stack
+# distances per (set count, line size) therefore gives the misses of every associativity.
+# The caches in verilog/ replace round robin, not LRU, so the curves are a close estimate to
+# screen configurations with (icachesim.py replays the exact policy for a single one).
+#
+# The distance of fetch i, whose line was last fetched at p, is the number of distinct lines
+# fetched in (p, i): (i - p - 1) minus the fetches in there that aren't the last fetch of their
+# line before i, i.e. minus #{k < i : prev(k) > p}. Those counts are answered for every fetch
+# together, offline, with a merge sort tree: at each level the fetches of the left half of every
+# block are sorted by prev(k) and the fetches of the right half count theirs with searchsorted,
+# so the whole stream takes O(n log^2 n) array work and no per fetch Python.
+#
+# The compressed icache of controller.v only ever holds lines whose words all compress, so its
+# curve is taken over the fetches of those lines alone; which words compress comes from the
+# memory image and the dictionaries profilebitfields.py wrote (profiling/field<n>_<name>.mem).
+# Without them the curve assumes every line compresses, an upper bound on what it can hold.
+#
+# usage: python3 stackdistance.py <trace> [<mem image> <dictionaries, e.g. I_<prog>>]
+
+LAYOUTS = {
+    "R": NAIVE_R_TYPE,
+    "I": NAIVE_I_TYPE,
+}
+
+# Index of the previous occurrence of each value (-1 for the first)
+def previous_occurrence(values):
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    same = ordered[1:] == ordered[:-1]
+    prev = np.full(len(values), -1, dtype=np.int64)
+    prev[order[1:][same]] = order[:-1][same]
+    return prev
+
+# For every i with prev[i] >= 0, the number of k < i with prev[k] > prev[i]
+def later_reuses(prev):
+    n = len(prev)
+    counts = np.zeros(n, dtype=np.int64)
+    pos = np.arange(n, dtype=np.int64)
+    stride = np.int64(n + 1)
+    for level in range(clog2(n) if n > 1 else 0):
+        block = pos >> (level + 1)
+        in_right = ((pos >> level) & 1).astype(bool)
+        points = np.sort(block[~in_right] * stride + prev[~in_right] + 1)
+        queries = in_right & (prev >= 0)
+        query_block = block[queries]
+        above = np.searchsorted(points, query_block * stride + prev[queries] + 1, side="right")
+        block_end = np.searchsorted(points, (query_block + 1) * stride, side="left")
+        counts[queries] += block_end - above
+    return counts
+
+# Histogram of the LRU stack distances of a stream of line addresses in a cache of [num_sets] sets
+# Returns (hist, cold) where hist[d] is the number of fetches at distance d and cold the number of
+# first fetches of a line (misses at any size)
+def stack_distance_histogram(lines, num_sets):
+    lines = np.asarray(lines, dtype=np.uint32)
+    num_fetches = len(lines)
+    # fetches of the line just used are at distance 0; drop them, then group the rest by set
+    lines = lines[run_starts(lines)]
+    sets = (lines & np.uint32(num_sets - 1)).astype(np.uint16 if num_sets <= 1 << 16 else np.uint32)
+    lines = lines[np.argsort(sets, kind="stable")]
+    lines = lines[run_starts(lines)]
+
+    prev = previous_occurrence(lines)
+    reused = prev >= 0
+    distances = (np.arange(len(lines))[reused] - prev[reused] - 1) - later_reuses(prev)[reused]
+    hist = np.bincount(distances, minlength=1)
+    hist[0] += num_fetches - len(lines)
+    return hist, int(len(lines) - reused.sum())
+
+# Misses of an LRU cache of [num_sets] sets for every associativity 1..[max_ways]
+def miss_curve(hist, cold, max_ways):
+    at_least = np.concatenate((np.cumsum(hist[::-1])[::-1], [0]))
+    ways = np.arange(1, max_ways + 1)
+    return cold + at_least[np.minimum(ways, len(hist))]
+
+# Miss ratio curves of a fetch stream for every set count in [set_counts] and line size
+# ([num_blocks] blocks) in [block_counts]
+# Returns [(num_blocks, num_sets, ways array, misses array)]
+def miss_ratio_curves(pcs, set_counts=(1, 2, 4, 8, 16, 32, 64, 128), block_counts=(NUM_BLOCKS,), max_ways=64):
+    curves = []
+    for num_blocks in block_counts:
+        lines = line_addresses(pcs, num_blocks)
+        for num_sets in set_counts:
+            hist, cold = stack_distance_histogram(lines, num_sets)
+            curves.append((num_blocks, num_sets, np.arange(1, max_ways + 1), miss_curve(hist, cold, max_ways)))
+    return curves
+
+# Prints the curves as cache size (for blocks of [block_size] B) vs miss rate
+def print_miss_ratio_curves(curves, num_fetches, block_size, title, ways_shown=(1, 2, 4, 8, 16, 32, 64)):
+    print("############################################")
+    print(title)
+    print("blocks  sets  ways  size (B)  misses      miss rate")
+    for num_blocks, num_sets, ways, misses in curves:
+        for way, miss in zip(ways.tolist(), misses.tolist()):
+            if way in ways_shown:
+                print("%-7d %-5d %-5d %-9d %-11d %f" % (num_blocks, num_sets, way, num_sets * way * num_blocks * block_size,
+                                                       miss, miss / num_fetches if num_fetches else 0.0))
+    print("############################################")
+
+# Whether each word of a memory image compresses with the dictionaries
+# profiling/field<n>_<name>.mem ([name] starting with the layout, R_ or I_)
+def compressible_words(mem_filename, name):
+    layout = LAYOUTS[name.split("_", 1)[0]]
+    dictionaries = [read_dictionary("profiling/field" + str(num + 1) + "_" + name + ".mem") for num in range(len(layout))]
+    hits, compressible = dictionary_hits(MemImage(mem_filename).layout_fields(layout), [dictionaries])
+    return compressible[0]
+
+def main():
+    filename = sys.argv[1]
+    pcs = fetch_addresses(load_trace(filename))
+    print("# fetches:", len(pcs))
+
+    curves = miss_ratio_curves(pcs, block_counts=(1, 2, 4, 8))
+    print_miss_ratio_curves(curves, len(pcs), BLOCK_SIZE, "LRU miss ratio curves, " + str(BLOCK_SIZE) + " B blocks (icache)")
+
+    lines = line_addresses(pcs, NUM_BLOCKS)
+    if len(sys.argv) > 3:
+        lines = lines[compressible_lines(lines, compressible_words(sys.argv[2], sys.argv[3]), NUM_BLOCKS)]
+        title = "compressed icache, dictionaries " + sys.argv[3]
+        print("# fetches of compressible lines:", len(lines))
+    else:
+        title = "compressed icache upper bound, every line compressible"
+    hist, cold = stack_distance_histogram(lines, 1)
+    print_miss_ratio_curves([(NUM_BLOCKS, 1, np.arange(1, 65), miss_curve(hist, cold, 64))], len(lines), BLOCK_SIZE_COMP,
+                            "LRU miss ratio curve, fully associative, " + str(BLOCK_SIZE_COMP) + " B blocks (" + title + ")")
+
+if __name__ == "__main__":
+    main()
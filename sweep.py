@@ -0,0 +1,224 @@
+import os
+import sys
+import csv
+import json
+import itertools
+import numpy as np
+from multiprocessing import Pool, shared_memory
+from fieldexplorer import *
+from tracecache import program_trace_file, load_trace, count_executed_instructions
+from memimage import MemImage
+from icachesim import fetch_addresses, cache_geometry, simulate_controller, BLOCK_SIZE, BLOCK_SIZE_COMP
+
+# Design space sweep over cache and dictionary configurations of controller.v
+# A grid (JSON file, or DEFAULT_GRID) lists the values to try for each parameter; every
+# combination is one configuration. For each, the dictionaries of the layout (the 2^key_width
+# most executed values of each field) decide which words of the memory image compress, and the
+# fetch stream of the trace is replayed through both caches (see icachesim.py).
+# The fetch PCs and one compressibility bitmap of the memory image per (layout, key widths) are
+# built once and put in shared memory; the workers of the pool attach to them and only get the
+# configuration to run. Every finished configuration is appended to the results file (.csv, or
+# .json for one JSON object per line) right away, and configurations already in it are skipped,
+# so an interrupted sweep picks up where it stopped.
+#
+# usage: python3 sweep.py <program> [grid.json|-] [results.csv|.json] [# processes]
+
+LAYOUTS = {
+    "R": NAIVE_R_TYPE,
+    "I": NAIVE_I_TYPE,
+}
+
+# key_widths: list of widths per field, or "best" for the best split of the compressed width
+DEFAULT_GRID = {
+    "cache_size": [1024, 2048, 4096],
+    "num_ways": [1, 2, 4, 8],
+    "num_blocks": [2, 4, 8],
+    "block_size": [BLOCK_SIZE],
+    "cache_size_comp": [256, 512, 1024],
+    "block_size_comp": [BLOCK_SIZE_COMP],
+    "layout": ["R", "I"],
+    "key_widths": [NAIVE_R_TYPE_KEY_WIDTHS, NAIVE_I_TYPE_KEY_WIDTHS, "best"],
+}
+
+CONFIG_COLUMNS = ["program", "cache_size", "num_ways", "num_blocks", "block_size",
+                  "cache_size_comp", "block_size_comp", "layout", "key_widths"]
+RESULT_COLUMNS = ["accesses", "compressible_words", "comp_hits",
+                  "icache_miss_rate", "icache_occupancy", "comp_miss_rate", "comp_occupancy",
+                  "combined_miss_rate", "imem_accesses"]
+
+def load_grid(filename=None):
+    grid = dict(DEFAULT_GRID)
+    if filename is not None:
+        with open(filename, 'r') as file:
+            grid.update(json.load(file))
+    return grid
+
+# A layout given as a name in LAYOUTS or as a list of fields of [end, start] ranges
+def parse_layout(layout):
+    if isinstance(layout, str):
+        return LAYOUTS[layout]
+    return tuple(tuple(tuple(bit_range) for bit_range in ranges) for ranges in layout)
+
+def layout_label(layout):
+    return layout if isinstance(layout, str) else layout_name(parse_layout(layout))
+
+def format_widths(widths):
+    return "/".join(str(width) for width in widths)
+
+# Every valid configuration of a grid, with "best" key widths resolved from the profile
+def grid_configs(grid, program_name, profile):
+    keys = list(DEFAULT_GRID.keys())
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = dict(zip(keys, values))
+        layout = parse_layout(config["layout"])
+        compressed_width = 8 * config["block_size_comp"]
+        key_widths = config["key_widths"]
+        if key_widths == "best":
+            key_widths = best_key_widths(profile, layout, compressed_width)[1]
+            if key_widths is None:
+                continue
+        if len(key_widths) != len(layout) or sum(key_widths) != compressed_width:
+            continue
+        try:
+            cache_geometry(config["cache_size"], config["num_ways"], config["num_blocks"], config["block_size"])
+            cache_geometry(config["cache_size_comp"], 1, config["num_blocks"], config["block_size_comp"])
+        except ValueError:
+            continue
+        config["program"] = program_name
+        config["layout"] = layout_label(config["layout"])
+        config["key_widths"] = format_widths(key_widths)
+        config["fields"] = layout
+        config["widths"] = tuple(key_widths)
+        yield config
+
+def config_key(row):
+    return tuple(str(row[column]) for column in CONFIG_COLUMNS)
+
+#######################################################
+# Shared memory
+#######################################################
+
+# Copies [arrays] into new shared memory blocks; returns (blocks, {name: (block name, shape, dtype)})
+def share_arrays(arrays):
+    blocks = []
+    specs = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+# Arrays attached by each worker of the pool
+shared = {}
+shared_blocks = []
+
+def attach_arrays(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        shared_blocks.append(block)
+        shared[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+#######################################################
+# Running configurations
+#######################################################
+
+# Runs one configuration against the shared arrays
+def run_config(task):
+    config, bitmap_idx = task
+    compressible = shared["compressible"][bitmap_idx]
+    stats = simulate_controller(shared["pcs"], compressible, config["cache_size"], config["num_ways"],
+                                config["num_blocks"], config["block_size"],
+                                config["cache_size_comp"], config["block_size_comp"])
+    row = {column: config[column] for column in CONFIG_COLUMNS}
+    row["accesses"] = stats["accesses"]
+    row["compressible_words"] = int(compressible.sum())
+    row["comp_hits"] = stats["comp"]["hits"]
+    row["icache_miss_rate"] = stats["icache"]["miss_rate"]
+    row["icache_occupancy"] = stats["icache"]["occupancy"]
+    row["comp_miss_rate"] = stats["comp"]["miss_rate"]
+    row["comp_occupancy"] = stats["comp"]["occupancy"]
+    row["combined_miss_rate"] = stats["combined"]["miss_rate"]
+    row["imem_accesses"] = stats["imem_accesses"]
+    return row
+
+# Rows already in a results file
+def read_results(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r') as file:
+        if filename.endswith(".json"):
+            return [json.loads(line) for line in file if line.strip()]
+        return list(csv.DictReader(file))
+
+# Appends one row to a results file (writing the CSV header first if it's new)
+def append_result(filename, row):
+    new_file = not os.path.exists(filename) or os.path.getsize(filename) == 0
+    with open(filename, 'a', newline='') as file:
+        if filename.endswith(".json"):
+            file.write(json.dumps(row) + "\n")
+        else:
+            writer = csv.DictWriter(file, fieldnames=CONFIG_COLUMNS + RESULT_COLUMNS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(row)
+
+# Runs every configuration of [grid] not already in [results_filename] on a pool of [processes]
+def sweep(program_name, grid, results_filename, processes=None, mem_filename=None):
+    if mem_filename is None:
+        mem_filename = os.path.join("programs", program_name + ".mem")
+    trace = load_trace(program_trace_file(program_name))
+    instructions, num_instructions, max_pc = count_executed_instructions(trace)
+    profile = FieldProfile(instructions, ())
+    words = MemImage(mem_filename).words
+
+    done = set(config_key(row) for row in read_results(results_filename))
+    configs = []
+    for config in grid_configs(grid, program_name, profile):
+        # "best" key widths can repeat an explicit entry
+        if config_key(config) not in done:
+            done.add(config_key(config))
+            configs.append(config)
+    num_done = len(done) - len(configs)
+    print("# configurations:", len(done), "(" + str(num_done) + " already done)")
+    if not configs:
+        return
+
+    # one compressibility bitmap per distinct dictionary
+    bitmaps = {}
+    for config in configs:
+        dictionary = (config["fields"], config["widths"])
+        if dictionary not in bitmaps:
+            bitmaps[dictionary] = len(bitmaps)
+    compressible = np.zeros((len(bitmaps), len(words)), dtype=bool)
+    for layout in set(layout for layout, key_widths in bitmaps):
+        candidates = [(key_widths, idx) for (other, key_widths), idx in bitmaps.items() if other == layout]
+        hits, layout_compressible = dictionary_hits([extract_field(words, ranges) for ranges in layout],
+                                                    [profile_dictionaries(profile, layout, key_widths)
+                                                     for key_widths, idx in candidates])
+        for (key_widths, idx), bitmap in zip(candidates, layout_compressible):
+            compressible[idx] = bitmap
+
+    tasks = [(config, bitmaps[(config["fields"], config["widths"])]) for config in configs]
+    blocks, specs = share_arrays({"pcs": fetch_addresses(trace), "compressible": compressible})
+    try:
+        with Pool(processes, initializer=attach_arrays, initargs=(specs,)) as pool:
+            for num, row in enumerate(pool.imap_unordered(run_config, tasks)):
+                append_result(results_filename, row)
+                print("[%d/%d]" % (num + 1, len(tasks)), " ".join(str(row[column]) for column in CONFIG_COLUMNS[1:]),
+                      "combined miss rate: %f" % row["combined_miss_rate"])
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+def main():
+    program_name = sys.argv[1]
+    grid = load_grid(sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != "-" else None)
+    results_filename = sys.argv[3] if len(sys.argv) > 3 else os.path.join("profiling", program_name + ".sweep.csv")
+    processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    sweep(program_name, grid, results_filename, processes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+from array import array
+import numpy as np
+import npzcache
+from npzcache import save_npz, load_npz
+from dumpindex import load_insns
+from tracedecode import decode_trace_words, insn_text
+
+# Columnar binary cache of a decoded trace, stored next to it as <trace_dump>.npz (or <trace>.npz
+# when it was decoded straight from the raw simv trace)
+# One row per decoded trace line:
+#   pc, instr, payload  uint32
+#   is_addr             memory access line ("@", the extra line of a load/store)
+#   is_branch           branch line (">")
+#   irq                 line decoded while an IRQ was active
+# plus the assembly text of every PC seen (asm_pc, asm_text).
+# The cache is keyed on the size and mtime of the file(s) it was built from and is rebuilt
+# whenever any of them changes (see npzcache.py).
+
+CACHE_VERSION = 1
+
+TRACE_COLUMNS = ("pc", "instr", "payload", "is_addr", "is_branch", "irq")
+
+def cache_path(filename):
+    return filename + ".npz"
+
+def source_key(*filenames):
+    return npzcache.source_key(CACHE_VERSION, *filenames)
+
+def is_raw_trace(filename):
+    return filename.endswith(".trace")
+
+# programs/<prog>.dump_abi for output/<prog>[.cont|.base|...].trace
+def default_dump_file(trace_filename):
+    program_name = os.path.basename(trace_filename).split(".")[0]
+    return os.path.join("programs", program_name + ".dump_abi")
+
+# Returns the trace of a program to profile: the raw trace when its disassembly is around,
+# the showtrace text dump otherwise
+def program_trace_file(program_name, output_dir="output"):
+    trace_filename = os.path.join(output_dir, program_name + ".trace")
+    if os.path.exists(trace_filename) and os.path.exists(default_dump_file(trace_filename)):
+        return trace_filename
+    return os.path.join(output_dir, program_name + ".trace_dump")
+
+# Yields (memory, PC, hex, assembly) for every decoded line of a trace dump, one line at a time
+def read_trace_dump(filename):
+    with open(filename, 'r') as file:
+        assembly_start = False
+        for line in file:
+            if "MEMACCES/REGWRITE" in line:
+                assembly_start = True
+                continue
+
+            if assembly_start:
+                parts = line.split('|')
+                if len(parts) < 4:
+                    continue
+                yield parts[0].strip(), parts[1].strip(), parts[2].strip(), parts[3].strip()
+
+# Parses a trace dump into the cache columns
+def convert_trace_dump(filename):
+    pc = array('I')
+    instr = array('I')
+    payload = array('I')
+    marker = bytearray()
+    irq = bytearray()
+    asm = {}
+    for memory, pc_hex, instr_hex, assembly in read_trace_dump(filename):
+        # memory field is "[IRQ ]<marker><payload>"
+        line_pc = int(pc_hex, 16)
+        pc.append(line_pc)
+        instr.append(int(instr_hex, 16))
+        payload.append(int(memory[-8:], 16))
+        marker.append(ord(memory[-9]))
+        irq.append(memory.startswith("IRQ"))
+        if line_pc not in asm:
+            asm[line_pc] = assembly
+
+    marker = np.frombuffer(bytes(marker), dtype=np.uint8)
+    return {
+        "pc": np.frombuffer(pc, dtype=np.uint32),
+        "instr": np.frombuffer(instr, dtype=np.uint32),
+        "payload": np.frombuffer(payload, dtype=np.uint32),
+        "is_addr": marker == ord("@"),
+        "is_branch": marker == ord(">"),
+        "irq": np.frombuffer(bytes(irq), dtype=bool),
+        "asm_pc": np.fromiter(asm.keys(), dtype=np.uint32, count=len(asm)),
+        "asm_text": np.array(list(asm.values()), dtype=str),
+    }
+
+# Decodes a raw trace into the cache columns
+def convert_raw_trace(trace_filename, dump_filename):
+    insns = load_insns(dump_filename)
+    pc = array('I')
+    instr = array('I')
+    payload = array('I')
+    is_addr = bytearray()
+    is_branch = bytearray()
+    irq = bytearray()
+    for record in decode_trace_words(trace_filename, insns):
+        pc.append(record[0])
+        instr.append(record[1])
+        is_addr.append(record[2])
+        is_branch.append(record[3])
+        irq.append(record[4])
+        payload.append(record[5])
+
+    pc = np.frombuffer(pc, dtype=np.uint32)
+    asm_pc = np.unique(pc)
+    return {
+        "pc": pc,
+        "instr": np.frombuffer(instr, dtype=np.uint32),
+        "payload": np.frombuffer(payload, dtype=np.uint32),
+        "is_addr": np.frombuffer(bytes(is_addr), dtype=bool),
+        "is_branch": np.frombuffer(bytes(is_branch), dtype=bool),
+        "irq": np.frombuffer(bytes(irq), dtype=bool),
+        "asm_pc": asm_pc,
+        "asm_text": np.array([insn_text(*insns[p]) for p in asm_pc.tolist()], dtype=str),
+    }
+
+def save_trace_cache(filename, trace, key=None):
+    if key is None:
+        key = source_key(filename)
+    save_npz(cache_path(filename), key, trace)
+
+# Returns the cached columns of [filename], or None if there's no up to date cache
+def load_trace_cache(filename, mmap=True, key=None):
+    if key is None:
+        key = source_key(filename)
+    return load_npz(cache_path(filename), key, mmap)
+
+# The files a trace is decoded from: a raw trace and its disassembly, or a trace dump
+def trace_sources(filename, dump_filename=None):
+    if is_raw_trace(filename):
+        return [filename, dump_filename if dump_filename is not None else default_dump_file(filename)]
+    return [filename]
+
+# Loads a trace through its cache, converting (and caching) it on first use
+# [filename] is either a showtrace text dump or a raw simv .trace, which is decoded against
+# [dump_filename] (programs/<prog>.dump_abi by default)
+def load_trace(filename, mmap=True, dump_filename=None):
+    sources = trace_sources(filename, dump_filename)
+    key = source_key(*sources)
+
+    trace = load_trace_cache(filename, mmap, key)
+    if trace is not None:
+        return trace
+    if is_raw_trace(filename):
+        trace = convert_raw_trace(filename, sources[1])
+    else:
+        trace = convert_trace_dump(filename)
+    try:
+        save_trace_cache(filename, trace, key)
+    except OSError as e:
+        print("Could not write trace cache for " + filename + ": " + str(e))
+    return trace
+
+# Returns {binary string: count} of the executed instructions (loads/stores counted once)
+# in order of first execution, along with the number of executed instructions and the max PC
+def count_executed_instructions(trace):
+    executed = ~np.asarray(trace["is_addr"])
+    instrs = np.asarray(trace["instr"])[executed]
+    pcs = np.asarray(trace["pc"])[executed]
+    if len(instrs) == 0:
+        return {}, 0, 0
+    unique, first_idx, counts = np.unique(instrs, return_index=True, return_counts=True)
+    order = np.argsort(first_idx, kind="stable")
+    instr_count = dict(zip((format(instr, "032b") for instr in unique[order].tolist()),
+                           counts[order].tolist()))
+    return instr_count, len(instrs), int(pcs.max())
@@ -0,0 +1,109 @@
+import numpy as np
+from dumpindex import load_insns
+
+# Decodes the raw simv trace (output/<prog>.trace) against the program's disassembly
+# (programs/<prog>.dump_abi) without going through the showtrace.py text dump.
+# Each trace word is 36 bits: [35] IRQ active, [33] memory address, [32] branch, [31:0] payload.
+# The PC is tracked the same way showtrace.py does it: a branch word sets the PC to its payload,
+# an address word (the first of the two words a load/store produces) leaves it where it is and
+# every other word steps it by 4 (or 2 for a compressed instruction).
+
+IRQ_BIT     = 0x800000000
+ADDR_BIT    = 0x200000000
+BRANCH_BIT  = 0x100000000
+
+RETIRQ_OPCODE = 0x0400000b
+IRQ_VECTOR    = 0x10
+
+def insn_size(opcode):
+    return 4 if (opcode & 3) == 3 else 2
+
+def insn_text(opcode, desc):
+    return "retirq" if opcode == RETIRQ_OPCODE else desc
+
+# simv writes every word with "%x\n", i.e. 9 hex digits (x for unknown bits, read as 0)
+TRACE_LINE_LEN = 10
+TRACE_BLOCK_LINES = 1 << 18
+
+HEX_VALUES = np.full(256, -1, dtype=np.int16)
+for digit, char in enumerate(b"0123456789abcdef"):
+    HEX_VALUES[char] = digit
+HEX_VALUES[ord("x")] = 0
+HEX_CHARS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+# Converts a block of complete trace lines into their 36 bit values
+def decode_trace_block(data):
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if len(buf) % TRACE_LINE_LEN == 0:
+        lines = buf.reshape(-1, TRACE_LINE_LEN)
+        digits = HEX_VALUES[lines[:, :-1]]
+        if (lines[:, -1] == ord("\n")).all() and (digits >= 0).all():
+            words = np.zeros(len(lines), dtype=np.uint64)
+            for col in range(TRACE_LINE_LEN - 1):
+                words = (words << np.uint64(4)) | digits[:, col].astype(np.uint64)
+            return words
+    # odd widths or digits: parse line by line like showtrace.py does
+    return np.array([int(line.replace(b"x", b"0"), 16) for line in data.splitlines()], dtype=np.uint64)
+
+# Yields the trace words of a raw trace in blocks of about [block_lines]
+def read_trace_blocks(trace_filename, block_lines=TRACE_BLOCK_LINES):
+    with open(trace_filename, "rb") as f:
+        while True:
+            data = f.read(block_lines * TRACE_LINE_LEN)
+            if not data:
+                break
+            if not data.endswith(b"\n"):
+                data += f.readline()
+            yield decode_trace_block(data)
+
+# Splits trace words into (payload, irq_active, is_addr, is_branch) arrays
+def split_trace_words(words):
+    payload = (words & np.uint64(0xffffffff)).astype(np.uint32)
+    irq_active = (words & np.uint64(IRQ_BIT)) != 0
+    is_addr = (words & np.uint64(ADDR_BIT)) != 0
+    is_branch = (words & np.uint64(BRANCH_BIT)) != 0
+    return payload, irq_active, is_addr, is_branch
+
+# Formats payloads as the "%08x" text showtrace.py prints, one bytes row per word
+def format_payloads(payload):
+    shifts = np.arange(28, -4, -4, dtype=np.uint32)
+    return HEX_CHARS[(payload[:, None] >> shifts) & np.uint32(0xf)]
+
+# Yields (pc, insn, is_addr, is_branch, irq, payload, line) for every trace word of [blocks]
+# (arrays of words, the first one being line [line] of the trace) that maps to an instruction
+# Decoding can start at any line: like showtrace.py, nothing maps until the first branch word.
+def decode_words(blocks, insns, line=0):
+    pc = -1
+    last_irq = False
+    for words in blocks:
+        payloads, irqs, addrs, branches = split_trace_words(words)
+        for payload, irq_active, is_addr, is_branch in zip(payloads.tolist(), irqs.tolist(),
+                                                           addrs.tolist(), branches.tolist()):
+            if irq_active and not last_irq:
+                pc = IRQ_VECTOR
+
+            if pc >= 0:
+                insn = insns.get(pc)
+                if insn is not None:
+                    yield pc, insn[0], is_addr, is_branch, irq_active or last_irq, payload, line
+                    if not is_addr:
+                        pc += insn_size(insn[0])
+                else:
+                    pc = -1
+
+            if is_branch:
+                pc = payload
+
+            last_irq = irq_active
+            line += 1
+
+# Yields (pc, insn, is_addr, is_branch, irq, payload, line) for every trace word that maps to
+# an instruction, i.e. every line showtrace.py prints with a PC
+def decode_trace_words(trace_filename, insns):
+    return decode_words(read_trace_blocks(trace_filename), insns)
+
+# Yields (pc, insn, is_addr, is_branch, irq) records from a raw trace and its disassembly
+def decode_trace(trace_filename, dump_filename):
+    insns = load_insns(dump_filename)
+    for pc, insn, is_addr, is_branch, irq, payload, line in decode_trace_words(trace_filename, insns):
+        yield pc, insn, is_addr, is_branch, irq
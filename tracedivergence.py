@@ -0,0 +1,180 @@
+import os
+import sys
+import zlib
+import numpy as np
+import npzcache
+from npzcache import save_npz, load_npz
+from dumpindex import load_insns, load_dump_index, pc_symbols
+from tracedecode import decode_words, decode_trace_block, insn_text, TRACE_LINE_LEN
+from tracecache import default_dump_file
+
+# Finds where two raw simv traces of the same program stop agreeing, e.g. output/<prog>.base.trace
+# (plain icache) against output/<prog>.cont.trace (compression controller)
+# Both runs should retire the same instructions with the same results, so the first trace word
+# that differs is where the cont run went wrong. The traces are memory mapped and never read in
+# full: a CRC32 of every CHUNK_BYTES of each trace is kept next to it as <trace>.crc.npz (keyed
+# on its size and mtime, see npzcache.py), the first chunk whose checksums differ is picked from
+# those, and the first differing word is binary searched inside it by the checksums of its halves.
+# Only a window of words around that point is decoded (against programs/<prog>.dump_abi) to show
+# the PCs and disassembly of both runs.
+#
+# usage: python3 tracedivergence.py <base trace> <cont trace> [dump_abi] [# context instructions]
+
+CHECKSUM_VERSION = 1
+CHUNK_BYTES = 1 << 22
+
+CONTEXT = 8
+# words decoded around the divergence: enough before it to pass a branch (where decoding syncs
+# up) and still have the context instructions
+WINDOW_BEFORE = 4096
+WINDOW_AFTER = 256
+
+NEWLINE = ord("\n")
+
+def map_trace(filename):
+    if os.path.getsize(filename) == 0:
+        return memoryview(b"")
+    return memoryview(np.memmap(filename, dtype=np.uint8, mode='r'))
+
+def checksum_path(filename):
+    return filename + ".crc.npz"
+
+def chunk_checksums(data):
+    return np.array([zlib.crc32(data[start:start + CHUNK_BYTES]) for start in range(0, len(data), CHUNK_BYTES)],
+                    dtype=np.uint32)
+
+# CRC32 of every chunk of a trace, through its cache
+def load_checksums(filename, data):
+    key = npzcache.source_key(CHECKSUM_VERSION, filename)
+    arrays = load_npz(checksum_path(filename), key, mmap=False)
+    if arrays is not None:
+        return arrays["crc"]
+    checksums = chunk_checksums(data)
+    try:
+        save_npz(checksum_path(filename), key, {"crc": checksums})
+    except OSError as e:
+        print("Could not write trace checksums for " + filename + ": " + str(e))
+    return checksums
+
+# Offset of the first byte where two traces differ (the length of the shorter one if it's a
+# prefix of the other), or None if they're the same
+def first_difference(data1, data2, checksums1, checksums2):
+    common = min(len(checksums1), len(checksums2))
+    mismatch = np.flatnonzero(checksums1[:common] != checksums2[:common])
+    if len(mismatch) == 0 and len(data1) == len(data2):
+        return None
+    if len(mismatch) == 0:
+        return min(len(data1), len(data2))
+
+    # everything before [lo] matches, something before [hi] doesn't
+    lo = int(mismatch[0]) * CHUNK_BYTES
+    hi = min(lo + CHUNK_BYTES, len(data1), len(data2))
+    if zlib.crc32(data1[lo:hi]) == zlib.crc32(data2[lo:hi]):
+        # one chunk is the other's prefix
+        return hi
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if zlib.crc32(data1[lo:mid]) == zlib.crc32(data2[lo:mid]):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def newlines_in(data, start, end):
+    return np.flatnonzero(np.frombuffer(data[start:end], dtype=np.uint8) == NEWLINE)
+
+def line_start(data, offset):
+    start = max(0, offset - 4 * TRACE_LINE_LEN)
+    newlines = newlines_in(data, start, offset)
+    return start + int(newlines[-1]) + 1 if len(newlines) else start
+
+# Offset of the line [num_lines] lines before the one starting at [offset] (or of the first line)
+def lines_before(data, offset, num_lines):
+    start = max(0, offset - 2 * TRACE_LINE_LEN * num_lines)
+    newlines = newlines_in(data, start, offset)
+    if len(newlines) > num_lines:
+        return start + int(newlines[-num_lines - 1]) + 1
+    return start if start == 0 or len(newlines) == 0 else start + int(newlines[0]) + 1
+
+# Offset just past [num_lines] lines from [offset] (or the end of the last whole line)
+def lines_after(data, offset, num_lines):
+    end = min(len(data), offset + 2 * TRACE_LINE_LEN * num_lines)
+    newlines = newlines_in(data, offset, end)
+    if len(newlines) >= num_lines:
+        return offset + int(newlines[num_lines - 1]) + 1
+    return end if end == len(data) or len(newlines) == 0 else offset + int(newlines[-1]) + 1
+
+def count_lines(data, start, end):
+    return sum(len(newlines_in(data, block, min(block + CHUNK_BYTES, end))) for block in range(start, end, CHUNK_BYTES))
+
+# Decoded (pc, insn, is_addr, is_branch, irq, payload, line) records of the words around the
+# line starting at [offset], which is line [line] of the trace
+def decode_window(data, offset, line, insns):
+    start = lines_before(data, offset, WINDOW_BEFORE)
+    end = lines_after(data, offset, WINDOW_AFTER)
+    if start >= end:
+        return []
+    words = decode_trace_block(bytes(data[start:end]))
+    return list(decode_words([words], insns, line - count_lines(data, start, offset)))
+
+# A record as the line showtrace.py prints for it
+def format_record(record, insns):
+    pc, insn, is_addr, is_branch, irq, payload, line = record
+    marker = ">" if is_branch else "@" if is_addr else "="
+    return "%s%s%08x | %08x | %08x | %s" % ("IRQ " if irq else "    ", marker, payload, pc, insn,
+                                            insn_text(insn, insns[pc][1]))
+
+def print_window(title, records, line, insns, symbols, context):
+    before = [record for record in records if record[6] < line][-context:]
+    after = [record for record in records if record[6] >= line][:context]
+    print(title)
+    for record in before:
+        print("    %10d  %s" % (record[6], format_record(record, insns)))
+    for num, record in enumerate(after):
+        print("%s  %10d  %s" % (">>" if num == 0 else "  ", record[6], format_record(record, insns)))
+    if after:
+        print("    first differing word in " + (symbols.get(after[0][0]) or "?"))
+    else:
+        print(">>  %10d  <end of trace>" % line)
+
+# Prints where two traces diverge, with [context] decoded instructions of each around it
+# Returns the line of the first differing word, or None if the traces are the same
+def find_divergence(base_filename, cont_filename, dump_filename=None, context=CONTEXT):
+    if dump_filename is None:
+        dump_filename = default_dump_file(base_filename)
+    base = map_trace(base_filename)
+    cont = map_trace(cont_filename)
+    offset = first_difference(base, cont, load_checksums(base_filename, base), load_checksums(cont_filename, cont))
+    if offset is None:
+        print("Traces are identical (" + str(count_lines(base, 0, len(base))) + " words)")
+        return None
+
+    offset = line_start(base, offset)
+    line = count_lines(base, 0, offset)
+    print("############################################")
+    print("Traces diverge at word " + str(line) + " (byte " + str(offset) + ")")
+    print("############################################")
+
+    insns = load_insns(dump_filename)
+    windows = [(filename, decode_window(data, offset, line, insns))
+               for filename, data in ((base_filename, base), (cont_filename, cont))]
+    pcs = np.array([record[0] for filename, records in windows for record in records], dtype=np.uint32)
+    symbols = dict(zip(pcs.tolist(), pc_symbols(load_dump_index(dump_filename), pcs).tolist())) if len(pcs) else {}
+    print("    %10s  %s" % ("word", "MEMACCES/REGWRITE   | PC | 0xINSTR  | Instruction"))
+    for filename, records in windows:
+        print_window(filename, records, line, insns, symbols, context)
+    print("############################################")
+    return line
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print("usage: python3 tracedivergence.py <base trace> <cont trace> [dump_abi] [# context instructions]")
+        sys.exit(1)
+    dump_filename = args[2] if len(args) > 2 else None
+    context = int(args[3]) if len(args) > 3 else CONTEXT
+    line = find_divergence(args[0], args[1], dump_filename, context)
+    sys.exit(0 if line is None else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import numpy as np
+from tracecache import load_trace
+
+# Executed instructions of a trace per static PC, for the assembly level profilers
+# (profiletracedump.py, scripts/isntr_stats.py)
+# A load/store shows up in a trace as two lines, the "@" memory address line and the line with
+# the data; only the second one is counted, so every dynamic instruction counts exactly once.
+# Counts are kept in one array entry per static PC and the assembly text of each PC is split into
+# mnemonic and operands once, however often the trace revisits it.
+
+# Splits "lw a5,12(sp)" into ("lw", ("a5", "12(sp)")) (a trailing "<symbol>" comment is dropped)
+def tokenize_assembly(text):
+    parts = text.split()
+    mnemonic = parts[0] if parts else ""
+    if len(parts) < 2 or parts[1].startswith("<"):
+        return mnemonic, ()
+    return mnemonic, tuple(parts[1].split(","))
+
+# "mnemonic operands" text of a tokenized instruction, what the profilers count by
+def assembly_key(tokens):
+    mnemonic, operands = tokens
+    return mnemonic + " " + ",".join(operands) if operands else mnemonic
+
+# ABI names of the integer and float registers (and their x<n>/f<n> names)
+REGISTER_NAMES = frozenset(["zero", "ra", "sp", "gp", "tp", "fp"]
+                           + ["t" + str(num) for num in range(7)] + ["s" + str(num) for num in range(12)]
+                           + ["a" + str(num) for num in range(8)]
+                           + ["ft" + str(num) for num in range(12)] + ["fs" + str(num) for num in range(12)]
+                           + ["fa" + str(num) for num in range(8)]
+                           + ["x" + str(num) for num in range(32)] + ["f" + str(num) for num in range(32)])
+
+# Registers and immediates of a tokenized instruction
+# Every operand is a register if it's a register name and an immediate otherwise (branch and
+# jump targets, shift amounts, CSRs, ...); "imm(reg)" of loads/stores is both
+def operand_fields(tokens):
+    operands = tokens[1]
+    regs = []
+    imms = []
+    for operand in operands:
+        if operand.endswith(")") and "(" in operand:
+            imm, reg = operand[:-1].split("(", 1)
+            regs.append(reg)
+            if imm:
+                imms.append(imm)
+        elif operand in REGISTER_NAMES:
+            regs.append(operand)
+        else:
+            imms.append(operand)
+    return regs, imms
+
+class PCProfile:
+    def __init__(self, trace):
+        executed = ~np.asarray(trace["is_addr"])
+        pcs = np.asarray(trace["pc"])[executed]
+        unique, first_idx, counts = np.unique(pcs, return_index=True, return_counts=True)
+        # static PCs in order of first execution, with how often each executed
+        order = np.argsort(first_idx, kind="stable")
+        self.pcs = unique[order]
+        self.counts = counts[order].astype(np.int64)
+        asm = dict(zip(np.asarray(trace["asm_pc"]).tolist(), np.asarray(trace["asm_text"]).tolist()))
+        self.tokens = [tokenize_assembly(asm.get(pc, "")) for pc in self.pcs.tolist()]
+
+    @classmethod
+    def from_file(cls, filename):
+        return cls(load_trace(filename))
+
+    def __len__(self):
+        return len(self.pcs)
+
+    def total_count(self):
+        return int(self.counts.sum())
+
+    # {"mnemonic operands": count} over every PC with that text, in order of first execution
+    def frequencies(self):
+        frequency = {}
+        for tokens, count in zip(self.tokens, self.counts.tolist()):
+            key = assembly_key(tokens)
+            frequency[key] = frequency.get(key, 0) + count
+        return frequency
+
+    # {"mnemonic operands": (mnemonic, operands)} for every text in the trace
+    def token_table(self):
+        return {assembly_key(tokens): tokens for tokens in self.tokens}